@@ -1,52 +1,122 @@
 ﻿import os
 import csv
-from collections import Counter 
+import hashlib
+import itertools
+import pickle
 from mongodb_functions import connect_to_mongodb, COLLECTION_NAME
 from file_utilities import get_unique_filename # Import the utility function
 
 # Define the base output filename globally
 BASE_OUTPUT_CSV_FILE = "job_skills_analysis_9_column_mongo_agg.csv"
-
-def aggregate_skill_counts(collection, match_filter):
+CSV_WRITE_BUFFER_SIZE = 1 << 20 # 1 MiB write buffer for the CSV output
+# Directory for cached aggregation results, reused while the collection is unchanged
+CACHE_DIR = ".cache"
+
+# Match filters for each skill group, keyed by the name used in the $facet output
+SKILL_GROUP_FILTERS = {
+    'all': {}, # Match all documents
+    'remote': {'job_types': 'Remote'},
+    'non_remote': {'job_types': {'$ne': 'Remote'}},
+}
+
+def aggregate_skill_counts(collection):
     """
-    Uses the MongoDB aggregation pipeline to group and count skills based on a match filter.
-    Returns a list of (skill, count) tuples and the total count of documents matched.
+    Uses a single MongoDB $facet aggregation to count skills and matched documents for every
+    group in SKILL_GROUP_FILTERS in one pass over the collection.
+    Returns a dict mapping each group name to a (skill_counts, total_jobs) tuple, where
+    skill_counts is a list of (skill, count) tuples sorted by count in descending order.
     """
-    
-    # 1. Count the total jobs matching the filter first
-    total_jobs = collection.count_documents(match_filter)
+
+    # 1. Build one sub-pipeline for the total and one for the skill counts of each group
+    facets = {}
+    for group, match_filter in SKILL_GROUP_FILTERS.items():
+        # Only add a $match stage when the group actually filters documents
+        match_stage = [{'$match': match_filter}] if match_filter else []
+
+        # Count every job in the group, including jobs without skills
+        facets[f'{group}_total'] = match_stage + [{'$count': 'n'}]
+
+        facets[f'{group}_skills'] = match_stage + [
+            # Deconstruct the skills array (documents with a missing or empty list are dropped)
+            {'$unwind': '$skills'},
+            # Group all the documents by skill name and count them
+            {'$group': {
+                '_id': '$skills',
+                'count': {'$sum': 1}
+            }},
+            # Sort by count in descending order
+            {'$sort': {'count': -1}}
+        ]
 
     # 2. Define the aggregation pipeline
     pipeline = [
-        # Match documents based on the filter (e.g., remote or non-remote)
-        {'$match': match_filter},
-        # Ensure the document has a non-empty skills list before unwinding
-        {'$match': {'skills': {'$exists': True, '$ne': []}}},
-        # Deconstruct the skills array field from the input documents to output a document for each element
-        {'$unwind': '$skills'},
-        # Group all the documents by skill name and count them
-        {'$group': {
-            '_id': '$skills',
-            'count': {'$sum': 1}
-        }},
-        # Sort by count in descending order
-        {'$sort': {'count': -1}}
+        # Project only the fields the facets read, so the (large) descriptions are not
+        # carried through every sub-pipeline
+        {'$project': {'_id': 0, 'skills': 1, 'job_types': 1}},
+        {'$facet': facets}
     ]
 
     try:
-        # Execute the aggregation pipeline
-        results = list(collection.aggregate(pipeline))
-        
+        # Execute the aggregation pipeline; $facet always returns exactly one document
+        facet_result = next(collection.aggregate(pipeline, allowDiskUse=True))
+
         # Convert results from MongoDB dictionary format to list of (skill, count) tuples
-        skill_counts = [
-            (doc['_id'], doc['count']) for doc in results
-        ]
-        
-        return skill_counts, total_jobs
-        
+        results = {}
+        for group in SKILL_GROUP_FILTERS:
+            totals = facet_result[f'{group}_total']
+            total_jobs = totals[0]['n'] if totals else 0
+            skill_counts = [
+                (doc['_id'], doc['count']) for doc in facet_result[f'{group}_skills']
+            ]
+            results[group] = (skill_counts, total_jobs)
+
+        return results
+
     except Exception as e:
         print(f"Error during MongoDB aggregation: {e}")
-        return [], 0
+        return {group: ([], 0) for group in SKILL_GROUP_FILTERS}
+
+def get_cached_skill_counts(collection):
+    """
+    Returns the aggregate_skill_counts() results, reusing an on-disk pickle cache while the
+    collection is unchanged. The cache key is the collection name, the estimated document
+    count and the newest '_id', so inserting new jobs invalidates the cache.
+    """
+    try:
+        newest_doc = collection.find_one({}, {'_id': 1}, sort=[('_id', -1)])
+        state_key = (
+            collection.full_name,
+            collection.estimated_document_count(),
+            newest_doc['_id'] if newest_doc else None
+        )
+    except Exception as e:
+        print(f"Could not determine collection state, skipping cache: {e}")
+        return aggregate_skill_counts(collection)
+
+    key_hash = hashlib.sha1(repr(state_key).encode('utf-8')).hexdigest()[:16]
+    cache_file = os.path.join(CACHE_DIR, f"skills_{key_hash}.pkl")
+
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as f:
+                results = pickle.load(f)
+            print(f"Collection unchanged since last run. Loaded cached skill counts from '{cache_file}'.")
+            return results
+        except Exception as e:
+            print(f"Could not read cache file '{cache_file}', recomputing: {e}")
+
+    results = aggregate_skill_counts(collection)
+
+    # Only cache successful, non-empty aggregations
+    if results['all'][1] > 0:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_file, 'wb') as f:
+                pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print(f"Warning: Could not write cache file '{cache_file}': {e}")
+
+    return results
 
 def analyze_job_skills(collection):
     """
@@ -57,21 +127,13 @@ def analyze_job_skills(collection):
         collection (Collection): The MongoDB collection object containing job data.
     """
 
-    # 1. Define match filters for aggregation
-    all_filter = {} # Match all documents
-    remote_filter = {'job_types': 'Remote'}
-    non_remote_filter = {'job_types': {'$ne': 'Remote'}}
-
-    # 2. Run aggregations to get counts and totals directly from MongoDB
-    print("Running aggregation for All Jobs...")
-    sorted_all_skills, total_all_jobs = aggregate_skill_counts(collection, all_filter)
-    
-    print("Running aggregation for Remote Jobs...")
-    sorted_remote_skills, total_remote_jobs = aggregate_skill_counts(collection, remote_filter)
-    
-    print("Running aggregation for Non-Remote Jobs...")
-    sorted_non_remote_skills, total_non_remote_jobs = aggregate_skill_counts(collection, non_remote_filter)
+    # 1. Run a single aggregation (or reuse its cached results) to get counts and totals from MongoDB
+    print("Running aggregation for All, Remote and Non-Remote Jobs...")
+    skill_results = get_cached_skill_counts(collection)
 
+    sorted_all_skills, total_all_jobs = skill_results['all']
+    sorted_remote_skills, total_remote_jobs = skill_results['remote']
+    sorted_non_remote_skills, total_non_remote_jobs = skill_results['non_remote']
 
     if total_all_jobs == 0:
         print("No job data found in MongoDB collection.")
@@ -80,8 +142,30 @@ def analyze_job_skills(collection):
     # Determine the unique output CSV filename using the utility function
     unique_output_filename = get_unique_filename(BASE_OUTPUT_CSV_FILE)
 
-    # Write data to a CSV file
-    with open(unique_output_filename, 'w', newline='', encoding='utf-8') as csvfile:
+    # Precompute the percentage multiplier for each section once (0.0 avoids division by zero)
+    inv_all = 100.0 / total_all_jobs if total_all_jobs else 0.0
+    inv_remote = 100.0 / total_remote_jobs if total_remote_jobs else 0.0
+    inv_non_remote = 100.0 / total_non_remote_jobs if total_non_remote_jobs else 0.0
+
+    # Helper function to format a percentage; padding cells for a section that has run out of skills stay empty
+    def pct(count, inv):
+        return "%.1f%%" % (count * inv) if count else ""
+
+    # Lazily generate the aligned rows, padding the shorter sections with empty cells
+    rows = (
+        (
+            all_skill, all_count, pct(all_count, inv_all),
+            remote_skill, remote_count, pct(remote_count, inv_remote),
+            non_remote_skill, non_remote_count, pct(non_remote_count, inv_non_remote)
+        )
+        for (all_skill, all_count), (remote_skill, remote_count), (non_remote_skill, non_remote_count)
+        in itertools.zip_longest(
+            sorted_all_skills, sorted_remote_skills, sorted_non_remote_skills, fillvalue=("", "")
+        )
+    )
+
+    # Write data to a CSV file through a large write buffer
+    with open(unique_output_filename, 'w', newline='', encoding='utf-8', buffering=CSV_WRITE_BUFFER_SIZE) as csvfile:
         csv_writer = csv.writer(csvfile)
 
         # Write the header row for all three sections, now including percentages
@@ -90,41 +174,9 @@ def analyze_job_skills(collection):
             "Remote Job Skills", "Count", "% Remote",
             "Non-Remote Job Skills", "Count", "% Non-Remote"
         ])
-        
-        # Determine the maximum number of rows to iterate over
-        max_rows = max(len(sorted_all_skills), len(sorted_remote_skills), len(sorted_non_remote_skills))
-        
-        # Helper function to calculate percentage and handle division by zero
-        def get_percentage(count, total):
-            return f"{(count / total * 100):.1f}%" if total > 0 and isinstance(count, int) else "0.0%"
-            
-        for i in range(max_rows):
-            # Safely get the skill and count for each list, or use empty strings if no more data
-            
-            # All Jobs Section
-            all_skill, all_count, all_percent = "", "", ""
-            if i < len(sorted_all_skills):
-                all_skill, all_count = sorted_all_skills[i]
-                all_percent = get_percentage(all_count, total_all_jobs)
-
-            # Remote Jobs Section
-            remote_skill, remote_count, remote_percent = "", "", ""
-            if i < len(sorted_remote_skills):
-                remote_skill, remote_count = sorted_remote_skills[i]
-                remote_percent = get_percentage(remote_count, total_remote_jobs)
-                
-            # Non-Remote Jobs Section
-            non_remote_skill, non_remote_count, non_remote_percent = "", "", ""
-            if i < len(sorted_non_remote_skills):
-                non_remote_skill, non_remote_count = sorted_non_remote_skills[i]
-                non_remote_percent = get_percentage(non_remote_count, total_non_remote_jobs)
-                
-            # Write the combined row to the CSV
-            csv_writer.writerow([
-                all_skill, all_count, all_percent,
-                remote_skill, remote_count, remote_percent,
-                non_remote_skill, non_remote_count, non_remote_percent
-            ])
+
+        # Stream all combined rows into the writer in a single call
+        csv_writer.writerows(rows)
 
     print(f"Successfully saved skill analysis to '{unique_output_filename}'.")
 
@@ -35,6 +35,7 @@ if __name__ == '__main__':
     # pip install Flask
     # pip install Flask-Cors
     # pip install beautifulsoup4
+    # pip install lxml
     # pip install requests
     
     # The debug=True flag automatically reloads the server on code changes
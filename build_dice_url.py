@@ -1,4 +1,14 @@
-from urllib.parse import urlencode, quote_plus
+from urllib.parse import quote_plus
+
+# Base URL for all Dice job searches
+BASE_URL = "https://www.dice.com/jobs?"
+
+# Maps the accepted (lowercase) workplace types to Dice's filter values
+WORKPLACE_TYPE_MAP = {
+    'remote': 'Remote',
+    'hybrid': 'Hybrid',
+    'onsite': 'Onsite'
+}
 
 def build_dice_url(search_text, location=None, workplace_type=None):
     """
@@ -17,37 +27,26 @@ def build_dice_url(search_text, location=None, workplace_type=None):
     Returns:
         str: The complete, formatted URL for the Dice job search.
     """
-    # Base URL for all Dice job searches
-    base_url = "https://www.dice.com/jobs?"
-    
     # List to hold the query parameters in the desired order
     ordered_params = []
     
     # Handle the workplace type filter first, if provided
+    # (the mapped values are URL-safe, so they need no quoting)
     if workplace_type:
-        workplace_type_map = {
-            'remote': 'Remote',
-            'hybrid': 'Hybrid',
-            'onsite': 'Onsite'
-        }
-        mapped_type = workplace_type_map.get(workplace_type.lower())
+        mapped_type = WORKPLACE_TYPE_MAP.get(workplace_type.lower())
         if mapped_type:
-            ordered_params.append(('filters.workplaceTypes', mapped_type))
+            ordered_params.append(f"filters.workplaceTypes={mapped_type}")
 
     # Add location next, if provided, and append the country code
     if location:
-        full_location = f"{location}, USA"
-        ordered_params.append(('location', full_location))
+        ordered_params.append(f"location={quote_plus(f'{location}, USA')}")
         
     # Add the primary search text last
     if search_text:
-        ordered_params.append(('q', search_text))
+        ordered_params.append(f"q={quote_plus(search_text)}")
 
-    # URL-encode the ordered parameters and build the final URL
-    query_string = urlencode(ordered_params, quote_via=quote_plus)
-    full_url = f"{base_url}{query_string}"
-    
-    return full_url
+    # Join the quoted parameters directly instead of going through urlencode
+    return BASE_URL + "&".join(ordered_params)
 
 if __name__ == '__main__':
     # --- Examples of how to use the function ---
@@ -1,7 +1,86 @@
 import requests
+import httpx
 from bs4 import BeautifulSoup
+import soupsieve as sv
 from datetime import datetime
 import re
+import asyncio
+
+# Browser-like headers shared by the sync and async scrapers
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Selectors for job details, compiled once at import instead of on every select() call
+TITLE_SELECTOR = sv.compile('[data-cy="jobTitle"]')
+COMPANY_SELECTOR = sv.compile('[data-cy="companyNameLink"]')
+LOCATION_SELECTOR = sv.compile('[data-cy="location"]')
+DESCRIPTION_SELECTOR = sv.compile('#jobDescription')
+JOB_TYPE_SELECTOR = sv.compile('[data-cy="locationDetails"] span')
+# Select all <span> tags within the div that has the data-cy="skillsList" attribute.
+SKILLS_SELECTOR = sv.compile('div[data-cy="skillsList"] span')
+SALARY_SELECTOR = sv.compile('[data-cy="payDetails"] span')
+POSTED_DATE_SELECTOR = sv.compile('meta[property="og:publish_date"]')
+DATES_SELECTOR = sv.compile('[data-cy="postedDate"]')
+
+MAX_RETRIES = 4 # Retries for throttled (429) or failing (5xx) responses, with exponential backoff
+
+def parse_dice_job(url, html):
+    """
+    Parses the HTML of a single Dice.com job posting and returns a dictionary
+    containing the job details.
+    """
+    # Parse the raw bytes with the C-based lxml parser (it detects the encoding itself)
+    soup = BeautifulSoup(html, 'lxml')
+
+    # Selectors for job details
+    title_element = TITLE_SELECTOR.select_one(soup)
+    company_element = COMPANY_SELECTOR.select_one(soup)
+    location_element = LOCATION_SELECTOR.select_one(soup)
+    description_element = DESCRIPTION_SELECTOR.select_one(soup)
+    job_type_elements = JOB_TYPE_SELECTOR.select(soup)
+    skills_elements = SKILLS_SELECTOR.select(soup)
+    salary_element = SALARY_SELECTOR.select_one(soup)
+    posted_date_element = POSTED_DATE_SELECTOR.select_one(soup)
+    dates_element = DATES_SELECTOR.select_one(soup)
+    
+    # Extract and clean data
+    title = title_element.get_text(strip=True) if title_element else 'N/A'
+    company = company_element.get_text(strip=True) if company_element else 'N/A'
+    location = location_element.get_text(strip=True) if location_element else 'N/A'
+    description = description_element.get_text(strip=False) if description_element else 'N/A'
+    posted_date = posted_date_element['content'] if posted_date_element else 'N/A'
+    
+    # Extract updated date text using string manipulation
+    updated_date = 'N/A'
+    if dates_element:
+        dates_text = dates_element.get_text(strip=True)
+        if '|' in dates_text:
+            parts = dates_text.split('|')
+            updated_date = parts[1].strip().replace('Updated ', '').strip()
+    
+    # Extract job type, skills, and salary if they exist.
+    job_types = [span.get_text(strip=True) for span in job_type_elements]
+    skills = [span.get_text(strip=True) for span in skills_elements]
+    salary = salary_element.get_text(strip=True) if salary_element else 'N/A'
+    
+    # Add the URL and current date/time to the output dictionary
+    job_details = {
+        'url': url,
+        'current_datetime': datetime.now().isoformat(),
+        'title': title,
+        'company': company,
+        'location': location,
+        'posted_date': posted_date,
+        'updated_date': updated_date,
+        'job_types': job_types,
+        'salary': salary,
+        'skills': skills,
+        'description': description
+        #'description': ' '.join(description.split())
+    }
+    
+    return job_details
 
 def scrape_dice_job(url):
     """
@@ -9,68 +88,11 @@ def scrape_dice_job(url):
     containing the job details.
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
         #print(f"Fetching URL: {url}")
-        response = requests.get(url, headers=headers, timeout=10)
+        response = requests.get(url, headers=HEADERS, timeout=10)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Selectors for job details
-        title_element = soup.select_one('[data-cy="jobTitle"]')
-        company_element = soup.select_one('[data-cy="companyNameLink"]')
-        location_element = soup.select_one('[data-cy="location"]')
-        description_element = soup.select_one('#jobDescription')
-        job_type_elements = soup.select('[data-cy="locationDetails"] span')
-        
-        # --- NEW: Corrected selector for skills list ---
-        # Select all <span> tags within the div that has the data-cy="skillsList" attribute.
-        skills_elements = soup.select('div[data-cy="skillsList"] span')
-        
-        salary_element = soup.select_one('[data-cy="payDetails"] span')
-        posted_date_element = soup.select_one('meta[property="og:publish_date"]')
-        dates_element = soup.select_one('[data-cy="postedDate"]')
-        
-        # Extract and clean data
-        title = title_element.get_text(strip=True) if title_element else 'N/A'
-        company = company_element.get_text(strip=True) if company_element else 'N/A'
-        location = location_element.get_text(strip=True) if location_element else 'N/A'
-        description = description_element.get_text(strip=False) if description_element else 'N/A'
-        posted_date = posted_date_element['content'] if posted_date_element else 'N/A'
-        
-        # Extract updated date text using string manipulation
-        updated_date = 'N/A'
-        if dates_element:
-            dates_text = dates_element.get_text(strip=True)
-            if '|' in dates_text:
-                parts = dates_text.split('|')
-                updated_date = parts[1].strip().replace('Updated ', '').strip()
-        
-        # Extract job type, skills, and salary if they exist.
-        job_types = [span.get_text(strip=True) for span in job_type_elements]
-        skills = [span.get_text(strip=True) for span in skills_elements]
-        salary = salary_element.get_text(strip=True) if salary_element else 'N/A'
-        
-        # Add the URL and current date/time to the output dictionary
-        job_details = {
-            'url': url,
-            'current_datetime': datetime.now().isoformat(),
-            'title': title,
-            'company': company,
-            'location': location,
-            'posted_date': posted_date,
-            'updated_date': updated_date,
-            'job_types': job_types,
-            'salary': salary,
-            'skills': skills,
-            'description': description
-            #'description': ' '.join(description.split())
-        }
-        
-        return job_details
+        return parse_dice_job(url, response.content)
 
     except requests.exceptions.RequestException as e:
         print(f"Error fetching the URL: {e}")
@@ -79,6 +101,58 @@ def scrape_dice_job(url):
         print(f"An error occurred during scraping: {e}")
         return None
 
+def is_retryable_status(status):
+    """True for statuses that mean "slow down" (429) or "try again later" (any 5xx) rather than "this page is broken"."""
+    return status == 429 or 500 <= status < 600
+
+async def request_with_backoff(send_request, get_status, limiter=None):
+    """
+    Awaits send_request() (a zero-argument coroutine function), waiting on the optional rate
+    limiter before every attempt. Responses whose status (read with get_status; None means
+    unknown) is 429 or 5xx are retried with exponential backoff (1s, 2s, 4s, ...) instead of
+    being treated as failures. Returns the last response.
+    """
+    for retry in range(MAX_RETRIES + 1):
+        if limiter:
+            await limiter.acquire()
+
+        response = await send_request()
+        status = get_status(response)
+        if status is None or not is_retryable_status(status) or retry == MAX_RETRIES:
+            return response
+
+        # The server is throttling us or struggling, so back off before trying again
+        await asyncio.sleep(2 ** retry)
+
+async def fetch_with_backoff(client, url, limiter=None):
+    """GETs a URL with the shared httpx.AsyncClient, rate limited and retried as in request_with_backoff."""
+    return await request_with_backoff(
+        lambda: client.get(url, timeout=10),
+        lambda response: response.status_code,
+        limiter
+    )
+
+async def scrape_dice_job_async(client, url, limiter=None, executor=None):
+    """
+    Async variant of scrape_dice_job that fetches the posting with a shared
+    httpx.AsyncClient, so many jobs can be fetched concurrently.
+    The HTML is parsed in the given executor (the loop's default one if None), so the
+    blocking parse doesn't stall the event loop while other fetches and DB writes are pending.
+    """
+    try:
+        response = await fetch_with_backoff(client, url, limiter)
+        response.raise_for_status()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, parse_dice_job, url, response.content)
+
+    except httpx.HTTPError as e:
+        print(f"Error fetching the URL: {e}")
+        return None
+    except Exception as e:
+        print(f"An error occurred during scraping: {e}")
+        return None
+
 if __name__ == "__main__":
     # Example URL for a Dice job posting
     dice_url = "https://www.dice.com/job-detail/f0618b89-21f4-4345-8187-cba96ad70903"
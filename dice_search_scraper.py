@@ -1,174 +1,295 @@
 import asyncio
+import httpx
+import lxml.html
 from playwright.async_api import async_playwright
 import re
 import itertools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pymongo import errors
 
-# Import the working scrape_dice_job function from your separate file.
+# Import the URL builder, the async job page scraper and its shared request/backoff helpers
 from build_dice_url import build_dice_url
-from dice_job_scraper import scrape_dice_job
+from dice_job_scraper import scrape_dice_job_async, fetch_with_backoff, request_with_backoff, HEADERS
+from rate_limiter import RateLimiter
 
 # Import MongoDB functions and constants
-from mongodb_functions import connect_to_mongodb, COLLECTION_NAME
+from mongodb_functions import connect_to_mongodb, bulk_update_search_tags, COLLECTION_NAME
+
+SEARCH_CACHE_COLLECTION_NAME = "search_cache"
+
+# --- Scraping Configuration ---
+MAX_CONCURRENT_SCRAPES = 8 # Maximum number of job detail pages fetched at the same time
+PROGRESS_LOG_INTERVAL = 50 # Log scraping progress every N completed links
+INSERT_BATCH_SIZE = 500 # Scraped jobs buffered before each bulk insert into MongoDB
+REQUESTS_PER_SECOND = 4 # Shared request budget for search pages and job detail pages
+SEARCH_CACHE_TTL = timedelta(hours=6) # How long a search's discovered job links are reused
+
+# Extracts the page count from the pagination aria-label, e.g. "Page 1 of 25"
+PAGE_COUNT_RE = re.compile(r'Page 1 of (\d+)')
+JOB_LINK_SELECTOR = 'a[data-testid="job-search-job-detail-link"]'
+PAGINATION_SELECTOR = 'section[aria-label^="Page 1 of"]'
+PAGINATION_READ_ATTEMPTS = 3 # Short retries when reading the pagination aria-label
+# Resource types the browser never needs to download for scraping text
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
 
 # --- MongoDB Data Management Functions ---
 
 def load_existing_urls_from_mongo(collection):
     """Loads all existing job URLs from MongoDB to identify which jobs to skip/update."""
     try:
-        # Query only for the 'url' field and return a set of unique URLs
-        # Using distinct() is highly efficient for getting all unique values of a field
-        urls = collection.distinct('url')
+        # Stream only the 'url' field in large batches. Hinting the unique 'url' index (created at
+        # startup) makes this a covered index scan, and unlike distinct() the result is not
+        # limited to a single 16MB BSON document.
+        projection = {'_id': 0, 'url': 1}
+        try:
+            urls = {
+                doc['url'] for doc in collection.find({}, projection).hint([('url', 1)]).batch_size(5000)
+                if doc.get('url')
+            }
+        except errors.OperationFailure as e:
+            # The 'url' index may be missing (connect_to_mongodb lets its build fail on duplicate urls),
+            # so fall back to the same projection without the hint rather than treating every link as new
+            print(f"Warning: 'url' index unavailable, loading existing job URLs with a collection scan: {e}")
+            urls = {
+                doc['url'] for doc in collection.find({}, projection).batch_size(5000)
+                if doc.get('url')
+            }
         print(f"Loaded {len(urls)} existing job URLs from MongoDB for check.")
-        return set(urls)
+        return urls
     except Exception as e:
         print(f"Error loading existing URLs from MongoDB: {e}")
         return set()
 
-def update_job_search_tag(collection, url, search_string):
-    """Updates an existing job document by adding a new search_string to the 'searches' array."""
+def insert_new_jobs(collection, jobs, search_string):
+    """
+    Inserts a batch of newly scraped job documents into MongoDB with the initial search tag
+    using a single unordered insert_many. Returns the number of documents inserted.
+    """
+    if not jobs:
+        return 0
+    for job_details in jobs:
+        job_details['searches'] = [search_string]
     try:
-        # $addToSet ensures the search_string is only added if it's not already in the array
-        result = collection.update_one(
-            {'url': url},
-            {'$addToSet': {'searches': search_string}}
-        )
-        return result.modified_count
+        result = collection.insert_many(jobs, ordered=False)
+        return len(result.inserted_ids)
+    except errors.BulkWriteError as bwe:
+        # With ordered=False every non-duplicate job is still inserted; jobs that already
+        # exist (duplicate 'url') fall back to updating their search tag instead
+        duplicate_urls = [
+            error['op']['url'] for error in bwe.details.get('writeErrors', [])
+            if error.get('code') == 11000
+        ]
+        if duplicate_urls:
+            print(f"Duplicate key error for {len(duplicate_urls)} jobs. Updating search tags instead.")
+            bulk_update_search_tags(collection, duplicate_urls, search_string)
+        return bwe.details.get('nInserted', 0)
     except Exception as e:
-        print(f"Error updating job {url} search tag: {e}")
+        print(f"Error inserting new jobs: {e}")
         return 0
-        
-def insert_new_job(collection, job_details, search_string):
-    """Inserts a newly scraped job document into MongoDB with the initial search tag."""
-    job_details['searches'] = [search_string]
+
+# --- Multi-Page Scraper using Playwright ---
+
+async def block_heavy_resources(route, request):
+    """Aborts image, media and font requests so pages load faster and use less memory."""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+def parse_total_pages(page_info_text):
+    """Returns the page count from the pagination aria-label text, or None if it is not present."""
+    match = PAGE_COUNT_RE.search(page_info_text or '')
+    return int(match.group(1)) if match else None
+
+async def fetch_links_static(client, url, limiter=None):
+    """
+    Fetches a search results page over plain HTTP and extracts the job detail links and the
+    total page count from the static HTML. Returns (links, total_pages), where links is None
+    when no links are found (e.g. they are rendered by JavaScript) so the caller can fall back
+    to Playwright, and total_pages is None when the pagination section is missing.
+    """
     try:
-        collection.insert_one(job_details)
-        return True
-    except errors.DuplicateKeyError:
-        # If a duplicate is encountered during insertion, fall back to updating the search tag
-        print(f"Duplicate key error for job {job_details.get('url')}. Updating search tag instead.")
-        return update_job_search_tag(collection, job_details['url'], search_string)
+        response = await fetch_with_backoff(client, url, limiter)
+        response.raise_for_status()
+
+        tree = lxml.html.fromstring(response.content)
+        hrefs = tree.xpath('//a[@data-testid="job-search-job-detail-link"]/@href')
+        page_labels = tree.xpath('//section[starts-with(@aria-label, "Page 1 of")]/@aria-label')
+
+        links = {href for href in hrefs if '/job-detail/' in href} or None
+        total_pages = parse_total_pages(page_labels[0]) if page_labels else None
+        return links, total_pages
     except Exception as e:
-        print(f"Error inserting new job: {e}")
-        return False
+        print(f"Static fetch failed for {url}, falling back to the browser. Error: {e}")
+        return None, None
 
-# --- Multi-Page Scraper using Playwright ---
+async def fetch_links_browser(page, url, read_total_pages=False, limiter=None):
+    """
+    Loads a search results page in the shared Playwright page and extracts the job detail
+    links. When read_total_pages is set, the total page count is also read from the
+    pagination aria-label. Returns (links, total_pages).
+    """
+    # Same rate limiter and 429/5xx backoff as the plain HTTP fetches (goto returns None for same-document navigations)
+    await request_with_backoff(
+        lambda: page.goto(url, wait_until="domcontentloaded", timeout=10000),
+        lambda response: response.status if response else None,
+        limiter
+    )
+    await page.wait_for_selector(JOB_LINK_SELECTOR)
+
+    # Read every href in one evaluation instead of one Playwright round trip per anchor
+    hrefs = await page.eval_on_selector_all(
+        JOB_LINK_SELECTOR, "els => els.map(e => e.getAttribute('href'))"
+    )
+    links = {href for href in hrefs if href and '/job-detail/' in href}
+
+    total_pages = None
+    if read_total_pages:
+        # The aria-label is in the DOM as soon as the results render, so read it directly with
+        # a short timeout (retried a few times) instead of waiting for the section to be visible
+        pagination_locator = page.locator(PAGINATION_SELECTOR).first
+        for attempt in range(1, PAGINATION_READ_ATTEMPTS + 1):
+            try:
+                page_info_text = await pagination_locator.get_attribute('aria-label', timeout=3000)
+                total_pages = parse_total_pages(page_info_text)
+                break
+            except Exception as e:
+                print(f"Could not read the pagination section (attempt {attempt}/{PAGINATION_READ_ATTEMPTS}). Error: {e}")
+
+    return links, total_pages
+
+async def collect_all_links(page, http_client, base_url, limiter=None):
+    """
+    Collects the unique job links (returned as a set) from every results page in a single
+    traversal, pacing requests with the shared rate limiter. The total page count is discovered while page 1
+    is loaded, so page 1 is only fetched once.
+    Each page is first fetched over plain HTTP; the browser page (owned by the caller and
+    reused for every results page) is only used when the static HTML is missing the links
+    (or, for page 1, the pagination section).
+    """
+    all_job_links = set()
+    total_pages = 1
+    page_num = 1
+
+    while page_num <= total_pages:
+        page_url = base_url if page_num == 1 else f"{base_url}&page={page_num}"
+        print(f"Fetching links from page {page_num}/{total_pages if page_num > 1 else '?'}...")
 
-async def get_total_pages(url):
-    """Retrieves the total number of pages from the search results using aria-label."""
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
         try:
-            await page.goto(url, wait_until="domcontentloaded", timeout=20000)
-            
-            pagination_locator = page.locator('section[aria-label^="Page 1 of"]')
-            await pagination_locator.wait_for(state='visible')
-            
-            page_info_text = await pagination_locator.get_attribute('aria-label')
-            
-            match = re.search(r'Page 1 of (\d+)', page_info_text)
-            total_pages = int(match.group(1)) if match else 1
-            
-            print(f"Total search result pages found: {total_pages}")
-            return total_pages
+            links, page_count = await fetch_links_static(http_client, page_url, limiter)
+            if not links or (page_num == 1 and page_count is None):
+                links, page_count = await fetch_links_browser(page, page_url, read_total_pages=(page_num == 1), limiter=limiter)
+            all_job_links.update(links)
+
+            if page_num == 1:
+                if page_count is None:
+                    print("Could not determine total pages, defaulting to 1.")
+                total_pages = page_count or 1
+                print(f"Total search result pages found: {total_pages}")
+
         except Exception as e:
-            print(f"Could not determine total pages, defaulting to 1. Error: {e}")
-            return 1
-        finally:
-            await browser.close()
+            print(f"Error fetching page {page_num}. Skipping. Error: {e}")
+
+        page_num += 1
 
-async def get_unique_job_links(base_url, total_pages, delay_seconds=1):
+    return all_job_links
+
+async def bounded_scrape(semaphore, client, url, limiter, parse_pool):
     """
-    Loops through each page, retrieves unique job links, and adds a delay.
+    Scrapes a single job while holding the semaphore; the rate limiter paces the actual
+    requests and the HTML is parsed on the parse_pool threads.
     """
-    all_job_links = set()
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        
-        for i in range(1, total_pages + 1):
-            page_url = base_url if i == 1 else f"{base_url}&page={i}"
-            print(f"Fetching links from page {i}/{total_pages}...")
-            
-            try:
-                await page.goto(page_url, wait_until="domcontentloaded", timeout=20000)
-                await page.wait_for_selector('a[data-testid="job-search-job-detail-link"]')
-                
-                links = await page.locator('a[data-testid="job-search-job-detail-link"]').all()
-                for link in links:
-                    href = await link.get_attribute('href')
-                    if href and '/job-detail/' in href:
-                        all_job_links.add(href)
-                
-                #print(f"Waiting for {delay_seconds} seconds before next page...")
-                await asyncio.sleep(delay_seconds)
-                
-            except Exception as e:
-                print(f"Error fetching page {i}. Skipping. Error: {e}")
-                continue
-        
-        await browser.close()
-    
-    return list(all_job_links)
+    async with semaphore:
+        return await scrape_dice_job_async(client, url, limiter, parse_pool)
+
+def get_cached_search_links(search_cache, search_url):
+    """
+    Returns the job links cached for search_url if they were discovered within
+    SEARCH_CACHE_TTL, otherwise None. The TTL check is done in the query itself because
+    the TTL monitor only deletes expired documents about once a minute.
+    """
+    cutoff = datetime.now(timezone.utc) - SEARCH_CACHE_TTL
+    cached = search_cache.find_one({'_id': search_url, 'ts': {'$gte': cutoff}}, {'links': 1})
+    return set(cached['links']) if cached else None
+
+def save_search_links(search_cache, search_url, links):
+    """Upserts the discovered job links for search_url with the current timestamp."""
+    search_cache.update_one(
+        {'_id': search_url},
+        {'$set': {'links': list(links), 'ts': datetime.now(timezone.utc)}},
+        upsert=True
+    )
 
 # --- Data Management and Orchestration ---
 
-async def main_scraper_orchestrator(search_url):
+async def main_scraper_orchestrator(page, http_client, limiter, parse_pool, job_collection, search_cache, existing_urls, search_url):
     """
     Main function to orchestrate the entire scraping and MongoDB saving process.
+    The Playwright page, the httpx client, the rate limiter, the parse thread pool, the job collection and the in-memory set of
+    existing job URLs are shared across searches by run_multiple_searches; existing_urls
+    is updated in place as new jobs are saved.
     """
-    # 1. Database Connection Setup
-    client, db = connect_to_mongodb()
-    if db is None:
-        return
-        
-    job_collection = db[COLLECTION_NAME]
-
-    # Extract the search string from the URL
+    # 1. Extract the search string from the URL
     search_string = search_url.split('?')[1] if '?' in search_url else 'N/A'
     print(f"\n=======================================================")
     print(f"Starting job scraping pipeline for search: {search_string}")
     print(f"=======================================================")
     
-    # 2. Get total pages and all job links
-    total_pages = await get_total_pages(search_url)
-    all_job_links = await get_unique_job_links(search_url, total_pages, delay_seconds=2)
-    
-    # 3. Load existing URLs from MongoDB to identify which links to scrape
-    existing_urls = load_existing_urls_from_mongo(job_collection)
+    # 2. Get all job links, reusing a recent crawl of the same search when one is cached;
+    # otherwise crawl every page, discovering the total pages on the first page load
+    all_job_links = get_cached_search_links(search_cache, search_url)
+    if all_job_links is not None:
+        print(f"Using {len(all_job_links)} cached job links discovered within the last {SEARCH_CACHE_TTL}.")
+    else:
+        all_job_links = await collect_all_links(page, http_client, search_url, limiter)
+        # Don't cache an empty result, it is more likely a failed crawl than an empty search
+        if all_job_links:
+            save_search_links(search_cache, search_url, all_job_links)
     
-    links_to_scrape = []
-    links_to_update = []
-
-    for link in all_job_links:
-        if link in existing_urls:
-            links_to_update.append(link)
-        else:
-            links_to_scrape.append(link)
+    # 3. Identify which links to scrape, using the cached set of existing URLs
+    # Partition the links with C-level set operations
+    links_to_scrape = all_job_links - existing_urls
+    links_to_update = all_job_links & existing_urls
     
     # 4. Update existing jobs with the new search string
     print(f"Updating {len(links_to_update)} existing jobs with new search tag...")
-    for link in links_to_update:
-        update_job_search_tag(job_collection, link, search_string)
+    bulk_update_search_tags(job_collection, links_to_update, search_string)
 
     # 5. Scrape details for new links and insert them
     print(f"Found {len(links_to_scrape)} new job links to scrape and insert.")
     
     scraped_count = 0
-    for i, link in enumerate(links_to_scrape):
-        job_details = scrape_dice_job(link)
-        
+    completed_count = 0
+    scraped_jobs = []
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCRAPES)
+    loop = asyncio.get_running_loop()
+    # Schedule every new link up front; the semaphore bounds how many are fetched at once,
+    # so one slow page no longer holds back the rest of its batch
+    tasks = [
+        asyncio.create_task(bounded_scrape(semaphore, http_client, link, limiter, parse_pool))
+        for link in links_to_scrape
+    ]
+
+    for next_result in asyncio.as_completed(tasks):
+        job_details = await next_result
+        completed_count += 1
         if job_details:
-            # Insert or update job details in MongoDB immediately after scraping
-            if insert_new_job(job_collection, job_details, search_string):
-                scraped_count += 1
-        
-        if(scraped_count %50 == 0) :        
-            print(f"-> Scraped and Saved {i+1}/{len(links_to_scrape)} new jobs.")
-        
-        # Wait 1 second between scraping requests
-        await asyncio.sleep(1)
+            scraped_jobs.append(job_details)
+
+        # Flush the insert buffer in a single round trip once it is full (and at the end).
+        # The blocking insert runs on the default executor so the event loop keeps driving
+        # the pending fetches while MongoDB saves the batch.
+        if len(scraped_jobs) >= INSERT_BATCH_SIZE or completed_count == len(tasks):
+            scraped_count += await loop.run_in_executor(
+                None, insert_new_jobs, job_collection, scraped_jobs, search_string
+            )
+            # Saved jobs (inserted or already present) count as existing for later searches
+            existing_urls.update(job['url'] for job in scraped_jobs)
+            scraped_jobs = []
+
+        if completed_count % PROGRESS_LOG_INTERVAL == 0 or completed_count == len(tasks):
+            print(f"-> Scraped {completed_count}/{len(links_to_scrape)} new jobs, saved {scraped_count} so far.")
 
     print(f"Scraping pipeline finished for search: {search_string}")
     print(f"Total new jobs inserted: {scraped_count}")
@@ -176,10 +297,52 @@ async def main_scraper_orchestrator(search_url):
 async def run_multiple_searches(search_urls):
     """
     Main function to run the scraper for a list of search URLs.
+    A single browser, context and page, and a single pooled httpx client, are created once
+    and shared by the link discovery and detail scraping of every search. The existing job
+    URLs are loaded from MongoDB once and kept up to date in memory across searches.
     """
-    for url in search_urls:
-        await main_scraper_orchestrator(url)
-        print("\n--- Moving to next search ---\n")
+    # 1. Database Connection Setup
+    client, db = connect_to_mongodb()
+    if db is None:
+        return
+
+    # The unique 'url' index that rejects duplicate inserts is created by connect_to_mongodb
+    job_collection = db[COLLECTION_NAME]
+
+    # Discovered links per search URL; the TTL index removes entries once they go stale
+    search_cache = db[SEARCH_CACHE_COLLECTION_NAME]
+    try:
+        search_cache.create_index('ts', expireAfterSeconds=int(SEARCH_CACHE_TTL.total_seconds()))
+    except errors.OperationFailure as e:
+        # e.g. an existing 'ts' index with a different TTL; get_cached_search_links checks the
+        # age itself, so the cache still works and stale entries are only left undeleted
+        print(f"Warning: Could not create the '{SEARCH_CACHE_COLLECTION_NAME}' TTL index: {e}")
+
+    # 2. Load existing URLs from MongoDB once for all searches
+    existing_urls = load_existing_urls_from_mongo(job_collection)
+
+    # One token bucket for every request of the run replaces the fixed per-request sleeps;
+    # 429 and 5xx responses (see is_retryable_status) back off exponentially on top of it
+    limiter = RateLimiter(REQUESTS_PER_SECOND)
+
+    # Job pages are parsed on worker threads so parsing overlaps with pending fetches and inserts
+    parse_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SCRAPES)
+
+    async with async_playwright() as p, \
+            httpx.AsyncClient(http2=True, headers=HEADERS, follow_redirects=True) as http_client:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            context = await browser.new_context()
+            # Register the resource filter before any navigation happens
+            await context.route("**/*", block_heavy_resources)
+            page = await context.new_page()
+
+            for url in search_urls:
+                await main_scraper_orchestrator(page, http_client, limiter, parse_pool, job_collection, search_cache, existing_urls, url)
+                print("\n--- Moving to next search ---\n")
+        finally:
+            await browser.close()
+            parse_pool.shutdown()
         
 if __name__ == '__main__':
 
@@ -201,14 +364,16 @@ if __name__ == '__main__':
         "software developer"
     ]
 
-    search_queries = []
-    for loc, work_type, search_str in itertools.product(locations, workplace_types, search_strings):
-        url = build_dice_url(
+    # Different combinations can build the same URL, so dedupe them before scraping.
+    # dict.fromkeys keeps the original search order, unlike a plain set.
+    search_queries = list(dict.fromkeys(
+        build_dice_url(
             search_text=search_str,
             location=loc,
             workplace_type=work_type
         )
-        search_queries.append(url)
+        for loc, work_type, search_str in itertools.product(locations, workplace_types, search_strings)
+    ))
     
     # The output filename constant is no longer needed here as data goes to MongoDB
     
@@ -1,5 +1,7 @@
 import csv
 import os
+import itertools
+from operator import itemgetter
 
 # Import MongoDB functions and constants
 from mongodb_functions import connect_to_mongodb, COLLECTION_NAME
@@ -21,17 +23,64 @@ COMBINED_SCORE_FIELD = 'combined_score'
 SEMANTIC_WEIGHT = 0.7   # Weighted 70%
 SKILLS_WEIGHT = 0.3     # Weighted 30%
 
+CSV_WRITE_BATCH_SIZE = 10000 # Rows buffered from the cursor before each writerows call
 
-def export_data_to_csv(data_list, output_csv_file):
+
+def build_export_pipeline():
     """
-    Transforms the list of job dictionaries into a list of simplified rows,
-    calculates the combined score, sorts them, and exports them to a CSV file.
-    The output_csv_file is the dynamically generated unique filename.
+    Builds the aggregation pipeline that selects the scored jobs, computes the combined
+    score and the CSV columns on the server, and sorts the rows. Only the projected
+    CSV columns are sent back over the wire.
     """
-    if not data_list:
-        print("No scored data found to export.")
-        return
+    return [
+        # Only export documents that have been scored (i.e., contain the semantic score field)
+        {'$match': {SEMANTIC_SCORE_FIELD: {'$exists': True}}},
+        # Get the individual fields (defaulting to 0.0 / 0 / 'N/A' if not found)
+        {'$project': {
+            '_id': 0,
+            'job_title': {'$ifNull': ['$title', 'N/A']},
+            'url': {'$ifNull': ['$url', 'N/A']},
+            SEMANTIC_SCORE_FIELD: {'$ifNull': [f'${SEMANTIC_SCORE_FIELD}', 0.0]},
+            SKILLS_SCORE_FIELD: {'$ifNull': [f'${SKILLS_SCORE_FIELD}', 0.0]},
+            MATCHED_SKILLS_COUNT_FIELD: {'$ifNull': [f'${MATCHED_SKILLS_COUNT_FIELD}', 0]},
+            'job_types': {'$ifNull': ['$job_types', []]}
+        }},
+        {'$addFields': {
+            # Calculate the new combined score
+            COMBINED_SCORE_FIELD: {'$round': [{'$add': [
+                {'$multiply': [f'${SEMANTIC_SCORE_FIELD}', SEMANTIC_WEIGHT]},
+                {'$multiply': [f'${SKILLS_SCORE_FIELD}', SKILLS_WEIGHT]}
+            ]}, 4]},
+            # A job is remote if any of its job types contains 'Remote'
+            'is_remote': {'$anyElementTrue': [{'$map': {
+                'input': '$job_types',
+                'as': 'jt',
+                'in': {'$ne': [{'$indexOfCP': ['$$jt', 'Remote']}, -1]}
+            }}]},
+            # Join the job types into a single ", " separated string
+            'job_types': {'$reduce': {
+                'input': '$job_types',
+                'initialValue': '',
+                'in': {'$cond': [
+                    {'$eq': ['$$value', '']},
+                    '$$this',
+                    {'$concat': ['$$value', ', ', '$$this']}
+                ]}
+            }}
+        }},
+        # Sort the rows: prioritize the new combined score, then semantic score (descending)
+        # This places the best overall matches at the top of the CSV.
+        {'$sort': {COMBINED_SCORE_FIELD: -1, SEMANTIC_SCORE_FIELD: -1}}
+    ]
 
+def export_data_to_csv(rows, output_csv_file):
+    """
+    Streams the already computed and sorted rows (e.g. an aggregation cursor) into
+    a CSV file. The output_csv_file is the dynamically generated unique filename.
+
+    Returns:
+        int: The number of rows written.
+    """
     # Define the fields for the CSV header, including the new matched skills count
     csv_fields = [
         'job_title', 
@@ -43,60 +92,37 @@ def export_data_to_csv(data_list, output_csv_file):
         'is_remote',
         'job_types' # Added job_types for completeness
     ]
-    
-    output_rows = []
-
-    for job in data_list:
-        # Calculate 'is_remote' flag and get job types
-        job_types = job.get('job_types', [])
-        is_remote = any('Remote' in jt for jt in job_types)
-
-        # Get the individual scores (defaulting to 0.0 if not found)
-        sem_score = job.get(SEMANTIC_SCORE_FIELD, 0.0)
-        skills_score = job.get(SKILLS_SCORE_FIELD, 0.0)
-        match_count = job.get(MATCHED_SKILLS_COUNT_FIELD, 0)
-        
-        # NOTE: OLD_SCORE_FIELD is no longer calculated but kept for historical context if it exists.
-        old_score = job.get(OLD_SCORE_FIELD, 0.0) 
-
-        # Calculate the new combined score
-        combined_score = round(
-            (sem_score * SEMANTIC_WEIGHT) + (skills_score * SKILLS_WEIGHT), 
-            4
-        )
-
-        # Create a simplified dictionary for the CSV row
-        row = {
-            'job_title': job.get('title', 'N/A'),
-            'url': job.get('url', 'N/A'),
-            SEMANTIC_SCORE_FIELD: sem_score,
-            SKILLS_SCORE_FIELD: skills_score,
-            MATCHED_SKILLS_COUNT_FIELD: match_count,
-            COMBINED_SCORE_FIELD: combined_score,
-            'is_remote': is_remote,
-            'job_types': ", ".join(job_types)
-        }
-        output_rows.append(row)
-
-    # Sort the list: prioritize the new combined score, then semantic score (descending)
-    # This places the best overall matches at the top of the CSV.
-    output_rows.sort(key=lambda x: (x[COMBINED_SCORE_FIELD], x[SEMANTIC_SCORE_FIELD]), reverse=True)
-
-    print(f"Exporting {len(output_rows)} records to {output_csv_file}...")
-    
+
+    # Pulls a row's values out as a tuple in header order
+    row_values = itemgetter(*csv_fields)
+
+    print(f"Exporting scored jobs to {output_csv_file}...")
+
+    row_count = 0
     try:
         with open(output_csv_file, 'w', newline='', encoding='utf-8') as csvfile:
-            # Use DictWriter to easily map dictionary keys to field names
-            writer = csv.DictWriter(csvfile, fieldnames=csv_fields)
-            writer.writeheader()
-            writer.writerows(output_rows)
-        print(f"Successfully exported data to {output_csv_file}")
+            # Plain csv.writer over tuples avoids DictWriter's per-row field name lookups
+            writer = csv.writer(csvfile)
+            writer.writerow(csv_fields)
+            # Write the cursor in fixed-size batches so only one batch is held in memory
+            batch = []
+            for row in rows:
+                batch.append(row_values(row))
+                if len(batch) == CSV_WRITE_BATCH_SIZE:
+                    writer.writerows(batch)
+                    row_count += len(batch)
+                    batch.clear()
+            writer.writerows(batch)
+            row_count += len(batch)
+        print(f"Successfully exported {row_count} records to {output_csv_file}")
     except Exception as e:
         print(f"An error occurred during CSV writing: {e}")
 
+    return row_count
+
 
 def main():
-    """Connects to MongoDB, retrieves scored data, and initiates the CSV export."""
+    """Connects to MongoDB, runs the export aggregation, and streams the results to CSV."""
     
     # Check for unique filename first, using the imported utility function
     unique_output_filename = get_unique_filename(BASE_OUTPUT_CSV_FILE)
@@ -107,24 +133,24 @@ def main():
         print("FATAL ERROR: Failed to connect to MongoDB. Exiting.")
         return
 
+    # The index backing the $match on scored documents is created by connect_to_mongodb
     job_collection = db[COLLECTION_NAME]
     
-    print(f"--- Loading job data from MongoDB collection: {COLLECTION_NAME} ---")
+    print(f"--- Loading scored job data from MongoDB collection: {COLLECTION_NAME} ---")
     try:
-        # Only fetch documents that have been scored (i.e., contain the semantic score field)
-        query = {SEMANTIC_SCORE_FIELD: {'$exists': True}}
-        # Fetch all fields except the internal MongoDB '_id'
-        jobs_data = list(job_collection.find(query, {'_id': 0})) 
-        print(f"Loaded {len(jobs_data)} scored jobs from MongoDB.")
+        # The server scores, projects and sorts the rows; allowDiskUse lets large sorts spill to disk
+        cursor = job_collection.aggregate(build_export_pipeline(), allowDiskUse=True)
+        # Peek at the first row so an empty result doesn't leave an empty CSV behind
+        first_row = next(cursor, None)
     except Exception as e:
         print(f"An unexpected error occurred while loading job data from MongoDB: {e}")
         return
 
-    if not jobs_data:
+    if first_row is None:
         print("No scored job data found to process. Exiting.")
         return
 
-    export_data_to_csv(jobs_data, unique_output_filename) # Pass the unique filename
+    export_data_to_csv(itertools.chain([first_row], cursor), unique_output_filename) # Pass the unique filename
 
 if __name__ == '__main__':
     main()
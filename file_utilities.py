@@ -15,11 +15,23 @@ def get_unique_filename(base_filename):
         return base_filename
 
     name, ext = os.path.splitext(base_filename)
-    counter = 1
-    new_filename = f"{name}_{counter}{ext}"
-    
-    while os.path.exists(new_filename):
-        counter += 1
-        new_filename = f"{name}_{counter}{ext}"
 
-    return new_filename
+    def suffix_exists(counter):
+        return os.path.exists(f"{name}_{counter}{ext}")
+
+    # Suffixes are normally created in order (_1, _2, ...), so find the first free one with
+    # O(log N) exists() checks instead of probing every suffix:
+    # 1. Double the upper bound until a free suffix is found
+    lo, hi = 0, 1
+    while suffix_exists(hi):
+        lo, hi = hi, hi * 2
+
+    # 2. Binary search between the last taken suffix (lo) and the free one (hi)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if suffix_exists(mid):
+            lo = mid
+        else:
+            hi = mid
+
+    return f"{name}_{hi}{ext}"
@@ -1,4 +1,4 @@
-import json
+import orjson
 import os
 # Import necessary components from the new functions file
 from pymongo import errors
@@ -15,11 +15,12 @@ def load_data_from_json(filepath):
         return []
 
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # orjson parses the raw UTF-8 bytes directly, much faster than the stdlib json module
+        with open(filepath, 'rb') as f:
+            data = orjson.loads(f.read())
         print(f"Loaded {len(data)} job records from JSON file.")
         return data
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"FATAL ERROR: Failed to decode JSON from {filepath}. Check file integrity.")
         return []
     except Exception as e:
@@ -33,9 +34,7 @@ def bulk_insert_jobs(db, job_data, collection_name):
     It uses the job 'url' as a unique identifier to prevent duplicate entries.
     """
     collection = db[collection_name]
-    
-    # Create an index on the 'url' field for quick lookups and uniqueness
-    collection.create_index("url", unique=True)
+    # The unique 'url' index is created once by connect_to_mongodb
     
     # Prepare documents for bulk operation
     documents_to_insert = []
@@ -1,38 +1,118 @@
 import os
-from pymongo import MongoClient, errors
+import atexit
+from functools import lru_cache
+from pymongo import MongoClient, IndexModel, UpdateOne, errors
 
 # --- MongoDB Configuration ---
 # All scripts connecting to MongoDB should import these constants.
 MONGO_URI = "mongodb://localhost:27017/" 
 DATABASE_NAME = "JobMatchDB"
-#COLLECTION_NAME = "dice_jobs"
+COLLECTION_NAME = "dice_jobs"
+MONGO_MAX_POOL_SIZE = 50 # Connections shared by threads and concurrent asyncio tasks
+MONGO_MIN_POOL_SIZE = 5 # Connections kept open (and warm) between operations
+MONGO_MAX_IDLE_TIME_MS = 300000 # Idle pooled connections are recycled after 5 minutes instead of lingering
 # -----------------------------
 
+@lru_cache(maxsize=None)
+def _get_client(uri):
+    """
+    Returns one shared MongoClient per URI, so repeated connect_to_mongodb() calls reuse
+    the same connection pool and topology monitoring instead of reconnecting.
+    The client is closed automatically when the interpreter exits, so callers don't close it.
+    """
+    client = MongoClient(
+        uri,
+        serverSelectionTimeoutMS=5000,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        retryWrites=True
+    )
+    atexit.register(client.close)
+    return client
+
+@lru_cache(maxsize=None)
+def _ensure_indexes(uri, database_name):
+    """
+    Creates the job collection indexes once per process (per URI and database), instead
+    of paying a create_index round trip every time a script loads or exports jobs:
+    - url (unique): backs the url lookups and rejects duplicate inserts
+    - semantic_score_v2 (sparse): backs the exporter's filter on scored jobs
+    """
+    collection = _get_client(uri)[database_name][COLLECTION_NAME]
+    collection.create_indexes([
+        IndexModel([('url', 1)], unique=True),
+        IndexModel([('semantic_score_v2', 1)], sparse=True)
+    ])
+
 def connect_to_mongodb():
     """
     Establishes a connection to MongoDB using predefined constants.
+    The underlying MongoClient is created once per process and shared by every caller.
     
     Returns:
         tuple: (MongoClient, Database) objects, or (None, None) on failure.
     """
     client = None
     try:
-        # Connect to the MongoDB client
-        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        # Get the shared MongoDB client
+        client = _get_client(MONGO_URI)
         # Attempt to confirm connection by calling server_info()
         client.admin.command('ping')
         
         db = client[DATABASE_NAME]
+        try:
+            _ensure_indexes(MONGO_URI, DATABASE_NAME)
+        except errors.OperationFailure as e:
+            # e.g. duplicate urls already in the collection; the connection itself is still usable
+            print(f"Warning: Could not create the '{COLLECTION_NAME}' indexes: {e}")
         print(f"Successfully connected to MongoDB and database '{DATABASE_NAME}'.")
-        # We return the client so it can be closed in the calling function's finally block
+        # The client is shared and closed at exit, so callers should not close it
         return client, db
     except errors.ConnectionFailure:
         print(f"FATAL ERROR: Could not connect to MongoDB at {MONGO_URI}. Is the server running?")
         if client:
+            # Drop the failed client from the cache so the next call starts fresh
+            _get_client.cache_clear()
             client.close()
         return None, None
     except Exception as e:
         print(f"An unexpected error occurred during connection: {e}")
         if client:
+            _get_client.cache_clear()
             client.close()
         return None, None
+
+def supports_transactions(client):
+    """
+    Returns True if the connected deployment supports multi-document transactions
+    (a replica set with a primary, or a sharded cluster). Standalone servers reject them.
+    """
+    return client.topology_description.topology_type_name in ('ReplicaSetWithPrimary', 'Sharded')
+
+def bulk_update_search_tags(collection, urls, search_string):
+    """
+    Adds search_string to the 'searches' array of every job in urls using a single
+    unordered bulk_write of UpdateOne operations (one round trip instead of one per job).
+    
+    Returns:
+        int: The number of documents modified.
+    """
+    if not urls:
+        return 0
+
+    # $addToSet ensures the search_string is only added if it's not already in the array
+    operations = [
+        UpdateOne({'url': url}, {'$addToSet': {'searches': search_string}})
+        for url in urls
+    ]
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        return result.modified_count
+    except errors.BulkWriteError as bwe:
+        # With ordered=False the remaining updates are still applied after a failure
+        print(f"Search tag update completed with {len(bwe.details.get('writeErrors', []))} errors.")
+        return bwe.details.get('nModified', 0)
+    except Exception as e:
+        print(f"Error updating search tags for {len(operations)} jobs: {e}")
+        return 0
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter for asyncio code. Tokens refill continuously at `rate`
+    per second up to `capacity`, so short bursts are allowed while the long-run
+    request rate stays at `rate` requests per second.
+
+    Args:
+        rate (float): Number of requests allowed per second.
+        capacity (int, optional): Maximum burst size. Defaults to `rate`.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Waits until a token is available and consumes it."""
+        async with self._lock:
+            while True:
+                # Refill the bucket based on the time elapsed since the last call
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                # Sleep just long enough for the next token to become available
+                await asyncio.sleep((1 - self._tokens) / self.rate)
@@ -1,11 +1,23 @@
 # -*- coding: utf-8 -*-
 import os
-import json
-from pymongo import errors
+import re
+import hashlib
+import queue
+import threading
+import itertools
+from pymongo import UpdateOne, errors
+from bson.binary import Binary
 # Use a free, local embedding model via sentence-transformers
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+from scipy.sparse import csr_matrix
+import torch
 from PyPDF2 import PdfReader
+try:
+    import ahocorasick # pip install pyahocorasick
+except ImportError:
+    # find_skills_in_resume falls back to a single precompiled regex
+    ahocorasick = None
 
 # Import MongoDB functions and constants
 from mongodb_functions import connect_to_mongodb, COLLECTION_NAME
@@ -15,62 +27,110 @@ MAX_CHARS = 16384
 DESCRIPTION_SNIPPET_LENGTH = 1000 # Max characters to take from the description for embedding
 BOILERPLATE_SKIP_CHARS = 200 # Skips this many characters from the start if description is long
 CHECKPOINT_INTERVAL = 10 # Control the logging frequency every X jobs processed
+GPU_EMBEDDING_BATCH_SIZE = 128 # Job texts encoded per model forward pass on CUDA
+CPU_EMBEDDING_BATCH_SIZE = 32 # Job texts encoded per model forward pass on CPU
+SCORE_WRITE_BATCH_SIZE = 500 # Score updates buffered before each bulk_write to MongoDB
+SCORE_QUEUE_MAX_SIZE = 2000 # Score updates waiting for the background writer thread
+JOB_FETCH_BATCH_SIZE = 500 # Job documents per cursor batch when loading jobs from MongoDB
+CACHE_DIR = ".cache" # Local cache for the resume text and vector
 
 # --- SCORING PARAMETERS ---
 MODEL_NAME = 'all-mpnet-base-v2' # More powerful local embedding model
+ONNX_CPU_MODEL_FILE = 'onnx/model_quint8_avx2.onnx' # int8-quantized ONNX export used on CPU
+MAX_SEQ_LENGTH = 384 # Token budget per text; longer inputs are truncated by the tokenizer
 
 # Fields for the separated scores, used for both Python dict and MongoDB keys
 SEMANTIC_SCORE_FIELD = 'semantic_score_v2'
 SKILLS_SCORE_FIELD = 'skills_intersection_score'
 MATCHED_SKILLS_COUNT_FIELD = 'matched_skills_count'
+EMBEDDING_FIELD = 'embedding_v2' # Normalized job vector, stored as float16 bytes
+EMBEDDING_MODEL_FIELD = 'embedding_v2_model' # Model/variant tag of the stored vector (see get_embedding_tag)
+SCORED_RESUME_FIELD = 'semantic_score_resume' # Resume key (see get_resume_key) the job's scores were calculated against
 # ------------------------------
 
 
 def extract_text_from_pdf(pdf_path):
     """
     Extracts text content from all pages of a PDF file.
+    Pages are extracted serially: on Windows every worker process would be spawned fresh and
+    re-import this script (torch, sentence-transformers, scipy), which costs far more than
+    PyPDF2 spends on a resume. The parsed resume is also cached between runs.
     """
     try:
         reader = PdfReader(pdf_path)
-        text = ""
-        for page in reader.pages:
-            # Ensure text extraction is not None before concatenating
-            extracted = page.extract_text()
-            if extracted:
-                text += extracted
-        return text.strip()
+        # Join once at the end instead of growing the string page by page
+        return "".join(page.extract_text() or "" for page in reader.pages).strip()
     except Exception as e:
         print(f"Error reading PDF file {pdf_path}: {e}")
         return ""
 
-def _update_job_scores_in_mongo(collection, job):
+def encode_embedding(vector):
+    """Packs a job vector into compact float16 bytes for storage in MongoDB."""
+    return Binary(vector.astype(np.float16).tobytes())
+
+def decode_embedding(data):
+    """
+    Unpacks a stored job vector into float32. It is re-normalized because float16
+    rounding leaves the stored vector only approximately unit length.
+    """
+    vector = np.frombuffer(data, dtype=np.float16).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def _build_score_update(job, resume_key, embedding=None, embedding_tag=None):
     """
-    Saves the calculated scores for a single job back to the MongoDB document.
-    It uses the job's 'url' field to locate and update the document.
+    Builds the UpdateOne operation that saves the calculated scores for a single job and the
+    key of the resume they were calculated against, plus its newly generated embedding (and
+    the tag of the model that produced it) if one is given.
+    It uses the job's 'url' field to locate the document. Returns None if the job has no URL.
     """
     url = job.get('url')
     if not url:
         print("Error: Cannot save score for job without a URL.")
+        return None
+
+    # Use $set to update only the score fields
+    fields = {
+        SEMANTIC_SCORE_FIELD: job.get(SEMANTIC_SCORE_FIELD),
+        SKILLS_SCORE_FIELD: job.get(SKILLS_SCORE_FIELD),
+        MATCHED_SKILLS_COUNT_FIELD: job.get(MATCHED_SKILLS_COUNT_FIELD),
+        SCORED_RESUME_FIELD: resume_key,
+    }
+    if embedding is not None:
+        fields[EMBEDDING_FIELD] = embedding
+        fields[EMBEDDING_MODEL_FIELD] = embedding_tag
+    return UpdateOne({'url': url}, {'$set': fields})
+
+def _flush_score_updates(collection, pending_ops):
+    """
+    Sends the buffered score updates to MongoDB in a single unordered bulk_write
+    and clears the buffer.
+    """
+    if not pending_ops:
         return
 
     try:
-        # Use $set to update only the score fields
-        result = collection.update_one(
-            {'url': url},
-            {'$set': {
-                SEMANTIC_SCORE_FIELD: job.get(SEMANTIC_SCORE_FIELD),
-                SKILLS_SCORE_FIELD: job.get(SKILLS_SCORE_FIELD),
-                MATCHED_SKILLS_COUNT_FIELD: job.get(MATCHED_SKILLS_COUNT_FIELD),
-            }}
-        )
-        if result.modified_count == 0 and result.matched_count > 0:
-            # This happens if the scores were already the same, which is fine
-            pass
-        elif result.matched_count == 0:
-            print(f"Warning: No document found to update for URL: {url}")
-            
+        result = collection.bulk_write(pending_ops, ordered=False)
+        # Unchanged scores still count as matched, which is fine
+        if result.matched_count < len(pending_ops):
+            print(f"Warning: No document found to update for {len(pending_ops) - result.matched_count} jobs.")
+    except errors.BulkWriteError as bwe:
+        print(f"Score update completed with {len(bwe.details.get('writeErrors', []))} errors.")
     except Exception as e:
-        print(f"Error saving scores to MongoDB for job {url}: {e}")
+        print(f"Error saving scores to MongoDB for {len(pending_ops)} jobs: {e}")
+    pending_ops.clear()
+
+def _score_writer(collection, update_queue):
+    """
+    Background thread that drains score updates from update_queue and saves them in
+    bulk_write batches, so the scoring loop never waits on MongoDB. A None item marks
+    the end of the updates; the last partial batch is flushed before the thread exits.
+    """
+    pending_ops = []
+    while (update := update_queue.get()) is not None:
+        pending_ops.append(update)
+        if len(pending_ops) >= SCORE_WRITE_BATCH_SIZE:
+            _flush_score_updates(collection, pending_ops)
+    _flush_score_updates(collection, pending_ops)
 
 def get_job_embedding_input(job):
     """
@@ -93,51 +153,214 @@ def get_job_embedding_input(job):
     return f"Job Title: {job_title}. Key Skills: {job_skills}. Context: {job_description_snippet}"
 
 
-def calculate_semantic_similarity(resume_vector, job_text_for_embedding, embedder, max_chars=MAX_CHARS):
+def load_cpu_embedder():
     """
-    Calculates the cosine similarity (semantic score) between the resume vector 
-    and the targeted job text.
+    Loads the embedding model for CPU inference. The int8-quantized ONNX export of the model
+    (run by ONNX Runtime) is tried first since it is several times faster than fp32 PyTorch
+    on CPU; if it can't be loaded (e.g. onnxruntime is not installed) the PyTorch model is used.
+    Returns (embedder, model_variant).
     """
-    if not job_text_for_embedding or job_text_for_embedding == 'N/A':
-        return 0.0
+    try:
+        embedder = SentenceTransformer(
+            MODEL_NAME,
+            device='cpu',
+            backend='onnx',
+            model_kwargs={'file_name': ONNX_CPU_MODEL_FILE}
+        )
+        return embedder, 'onnx-int8'
+    except Exception as e:
+        print(f"Could not load the quantized ONNX model, falling back to PyTorch: {e}")
+        print("For faster CPU inference: pip install sentence-transformers[onnx]")
+        return SentenceTransformer(MODEL_NAME, device='cpu'), 'torch-fp32'
 
-    # The input text is already targeted and should be within MAX_CHARS, but we truncate defensively
-    if len(job_text_for_embedding) > max_chars:
-        job_text_for_embedding = job_text_for_embedding[:max_chars]
+def get_embedding_tag(model_variant):
+    """
+    Returns the tag stored with each job vector. The CUDA fp16, ONNX int8 and PyTorch fp32
+    encoders produce slightly different vectors, so a stored vector is only reused by a run
+    with the same model, backend/precision and token budget.
+    """
+    return f"{MODEL_NAME}|{model_variant}|{MAX_SEQ_LENGTH}"
 
-    # Generate vector for the job description using the 'all-mpnet-base-v2' model
-    job_description_vector = embedder.encode(job_text_for_embedding, convert_to_numpy=True)
+def get_resume_key(resume_file, model_variant):
+    """
+    Returns a short hash of the PDF bytes, the embedding tag (model, backend/precision and
+    token budget, the same rules as the stored job vectors) and MAX_CHARS. It names the resume
+    cache file and is saved with every job's scores, so a changed resume, model or truncation
+    setting never reuses a stale resume vector and marks previously scored jobs for rescoring.
+    """
+    with open(resume_file, 'rb') as f:
+        key = hashlib.blake2b(f.read(), digest_size=8)
+    key.update(f"{get_embedding_tag(model_variant)}|{MAX_CHARS}".encode('utf-8'))
+    return key.hexdigest()
 
-    # Cosine similarity requires the input to be in a 2D array format
-    score = cosine_similarity([resume_vector], [job_description_vector])[0][0]
-    return float(score)
+def get_resume_cache_file(resume_key):
+    """Returns the .npz cache path for the resume with the given key (see get_resume_key)."""
+    return os.path.join(CACHE_DIR, f"resume_{resume_key}.npz")
 
-def calculate_skills_intersection_score(resume_text, job_skills):
+def load_cached_resume(cache_file):
     """
-    Calculates the skills ratio score and returns the score and the raw count of matches.
-    Score = (Matched Skills) / (Total Unique Job Skills)
+    Returns the cached (resume_text, normalized resume_vector) pair, or (None, None) on a miss.
     """
-    if not job_skills or not resume_text:
-        return 0.0, 0 # Return score and count
+    if os.path.exists(cache_file):
+        try:
+            with np.load(cache_file) as cached:
+                resume_text, resume_vector = str(cached['text']), cached['vector']
+            print(f"Resume unchanged since last run. Loaded cached resume vector from '{cache_file}'.")
+            return resume_text, resume_vector
+        except Exception as e:
+            print(f"Could not read cache file '{cache_file}', recomputing: {e}")
+    return None, None
+
+def save_cached_resume(cache_file, resume_text, resume_vector):
+    """Saves the resume text and normalized vector so later runs can skip the PDF parse and encode."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez(cache_file, text=np.array(resume_text), vector=resume_vector)
+    except Exception as e:
+        print(f"Warning: Could not write cache file '{cache_file}': {e}")
 
-    # Convert resume text to lowercase for case-insensitive matching
-    resume_text_lower = resume_text.lower()
-    
-    match_count = 0
-    # Use a set for unique job skills to avoid double counting
-    unique_job_skills = set(job_skills)
-    
-    for skill in unique_job_skills:
-        skill_lower = skill.lower().strip()
-        # Simple check: if the skill phrase is found in the resume text
-        if skill_lower and skill_lower in resume_text_lower:
-            match_count += 1
-            
-    # Score is the ratio of matched skills to total required unique skills
-    score = match_count / len(unique_job_skills)
-    
-    # Return both the ratio score and the raw count
-    return score, match_count
+def calculate_semantic_similarities(resume_text, resume_vector, job_texts_for_embedding, embedder, batch_size=CPU_EMBEDDING_BATCH_SIZE):
+    """
+    Calculates the cosine similarity (semantic score) between the normalized resume vector
+    and each of the targeted job texts. All texts are encoded in a single batched encode()
+    call, which sorts them by length so similar-length texts share a batch.
+    If resume_vector is None (no cached vector), the resume text is encoded in the same call
+    as the first row instead of with a separate encode().
+    Returns (scores, resume_vector, job_matrix), where job_matrix holds the normalized job vectors.
+    """
+    encode_resume = resume_vector is None
+
+    # get_job_embedding_input already keeps the texts short, and the tokenizer truncates
+    # anything past the model's max_seq_length, so no character slicing is needed here
+    texts_to_encode = list(job_texts_for_embedding)
+    if encode_resume:
+        texts_to_encode.insert(0, resume_text)
+    if not texts_to_encode:
+        return [], resume_vector, np.empty((0, 0), dtype=np.float32)
+
+    # Generate vectors for the resume and all job descriptions using the 'all-mpnet-base-v2' model
+    # normalize_embeddings=True returns unit-length vectors, so no norms are needed below
+    vectors = embedder.encode(
+        texts_to_encode,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=True
+    )
+
+    # Keep the (N x D) matrix as one C-contiguous float32 block (a half precision model
+    # returns float16) so the scores are a single BLAS matrix-vector product
+    job_matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if encode_resume:
+        resume_vector, job_matrix = job_matrix[0], job_matrix[1:]
+
+    # With both sides normalized, cosine similarity is a plain dot product
+    scores = job_matrix @ resume_vector.astype(np.float32, copy=False)
+    return [float(score) for score in scores], resume_vector, job_matrix
+
+def get_job_scoring_status(job, resume_key):
+    """
+    Checks which scores a job is missing. Scores calculated against a different resume
+    (another resume_key) count as missing, so the job is rescored against the current one.
+    Returns (needs_scoring, semantic_score_exists).
+    """
+    # Check if scoring is needed (i.e., if new scores are missing or 0.0)
+    # We also check for the existence of the score fields to handle cases where they might be explicitly 0.
+    # A null score counts as missing, the same as the $not/$gt queries that fetch the jobs.
+    semantic_score_exists = (
+        (job.get(SEMANTIC_SCORE_FIELD) or 0.0) > 0.0
+        and job.get(SCORED_RESUME_FIELD) == resume_key
+    )
+    skills_score_exists = (job.get(SKILLS_SCORE_FIELD) or 0.0) > 0.0
+    raw_count_exists = MATCHED_SKILLS_COUNT_FIELD in job
+
+    needs_scoring = not (semantic_score_exists and skills_score_exists and raw_count_exists)
+    return needs_scoring, semantic_score_exists
+
+def build_skill_norm_map(jobs_data):
+    """
+    Maps every raw skill string across the jobs to its normalized (lowercased and stripped)
+    form, so each distinct skill string is normalized once instead of once per job.
+    """
+    return {
+        skill: skill.lower().strip()
+        for job in jobs_data
+        for skill in job.get('skills', [])
+    }
+
+def find_skills_in_resume(resume_text, skill_norm):
+    """
+    Finds every job skill that appears in the resume text.
+    All unique normalized skills are loaded into one Aho-Corasick automaton (or, without
+    pyahocorasick, one regex alternation), so the resume is scanned once for all of them
+    instead of once per skill per job.
+    Returns the set of matched skills (lowercased and stripped).
+    """
+    all_skills = set(skill_norm.values())
+    all_skills.discard('')
+    if not all_skills or not resume_text:
+        return set()
+
+    if ahocorasick is None:
+        return find_skills_with_regex(resume_text, all_skills)
+
+    automaton = ahocorasick.Automaton()
+    for skill in all_skills:
+        automaton.add_word(skill, skill)
+    automaton.make_automaton()
+
+    # iter() reports every (overlapping) occurrence, so this matches the old substring check
+    return {skill for _, skill in automaton.iter(resume_text.lower())}
+
+def find_skills_with_regex(resume_text, all_skills):
+    """
+    Regex fallback for find_skills_in_resume. The alternation is wrapped in a lookahead so a
+    match is tried at every position (overlapping hits are found), and the longest skills
+    are listed first so each position reports its longest matching skill. Shorter skills
+    matching at the same position are prefixes of that hit and are added from it.
+    No word boundaries are used, matching the plain substring check of the scorer.
+    """
+    pattern = re.compile(
+        '(?=(' + '|'.join(re.escape(skill) for skill in sorted(all_skills, key=len, reverse=True)) + '))'
+    )
+    hits = set(pattern.findall(resume_text.lower()))
+    return {hit[:length] for hit in hits for length in range(1, len(hit) + 1) if hit[:length] in all_skills}
+
+def calculate_skills_intersection_scores(resume_skills, jobs_data, skill_norm):
+    """
+    Calculates the skills ratio score and the raw count of matches for every job at once.
+    Score = (Matched Skills) / (Total Unique Job Skills)
+    Each job's unique skills are a row of a sparse (jobs x skills) 0/1 matrix, so the match
+    counts for all jobs are one sparse matrix-vector product with the resume's skill vector.
+    resume_skills is the set of matched skills returned by find_skills_in_resume, and
+    skill_norm is the raw-to-normalized skill map from build_skill_norm_map.
+    Returns (scores, match_counts) as NumPy arrays aligned with jobs_data.
+    """
+    # Columns are the raw skill strings, so a job listing both 'Python' and 'python' still
+    # counts both towards its total
+    vocab = {skill: idx for idx, skill in enumerate(skill_norm)}
+    resume_present = np.array(
+        [1.0 if skill_norm[skill] in resume_skills else 0.0 for skill in vocab], dtype=np.float64
+    )
+
+    rows, cols = [], []
+    for row, job in enumerate(jobs_data):
+        # Use a set for unique job skills to avoid double counting
+        for skill in set(job.get('skills', [])):
+            rows.append(row)
+            cols.append(vocab[skill])
+
+    job_skill_matrix = csr_matrix(
+        (np.ones(len(rows), dtype=np.float64), (rows, cols)),
+        shape=(len(jobs_data), len(vocab))
+    )
+
+    match_counts = job_skill_matrix @ resume_present
+    totals = np.asarray(job_skill_matrix.sum(axis=1)).ravel()
+
+    # Score is the ratio of matched skills to total required unique skills (0.0 for jobs without skills)
+    scores = np.divide(match_counts, totals, out=np.zeros_like(match_counts), where=totals > 0)
+    return scores, match_counts.astype(np.int64)
 
 def score_jobs_against_resume(resume_file="DougOsborne_Resume.pdf", checkpoint_interval=CHECKPOINT_INTERVAL):
     """
@@ -146,8 +369,19 @@ def score_jobs_against_resume(resume_file="DougOsborne_Resume.pdf", checkpoint_i
     """
     # --- Local Embedding Setup ---
     try:
-        print(f"Initializing local embedding model ({MODEL_NAME})...")
-        embedder = SentenceTransformer(MODEL_NAME)
+        # Use the GPU in half precision when one is available, otherwise all CPU cores
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        print(f"Initializing local embedding model ({MODEL_NAME}) on {device}...")
+        if device == 'cuda':
+            embedder = SentenceTransformer(MODEL_NAME, device=device).half()
+            model_variant = 'torch-fp16'
+            embedding_batch_size = GPU_EMBEDDING_BATCH_SIZE
+        else:
+            embedder, model_variant = load_cpu_embedder()
+            torch.set_num_threads(os.cpu_count())
+            embedding_batch_size = CPU_EMBEDDING_BATCH_SIZE
+        # all-mpnet-base-v2 was trained on up to 384 tokens; the tokenizer truncates to this
+        embedder.max_seq_length = MAX_SEQ_LENGTH
         print("Model loaded successfully.")
     except Exception as e:
         print(f"FATAL ERROR: Could not load SentenceTransformer model: {e}")
@@ -159,18 +393,21 @@ def score_jobs_against_resume(resume_file="DougOsborne_Resume.pdf", checkpoint_i
         print(f"FATAL ERROR: Resume file '{resume_file}' not found.")
         return
 
-    resume_text = extract_text_from_pdf(resume_file)
-    if not resume_text:
-        print("FATAL ERROR: Could not extract text from resume.")
-        return
+    resume_key = get_resume_key(resume_file, model_variant)
+    resume_cache_file = get_resume_cache_file(resume_key)
+    resume_text, resume_vector = load_cached_resume(resume_cache_file)
+    if resume_text is None:
+        resume_text = extract_text_from_pdf(resume_file)
+        if not resume_text:
+            print("FATAL ERROR: Could not extract text from resume.")
+            return
 
-    if len(resume_text) > MAX_CHARS:
-        resume_text = resume_text[:MAX_CHARS]
-        print(f"Warning: Resume text truncated to {MAX_CHARS} characters.")
+        if len(resume_text) > MAX_CHARS:
+            resume_text = resume_text[:MAX_CHARS]
+            print(f"Warning: Resume text truncated to {MAX_CHARS} characters.")
+        # The resume vector is generated together with the job vectors in step 3
 
-    print("\n--- Generating Resume Vector (One time) ---")
-    resume_vector = embedder.encode(resume_text, convert_to_numpy=True)
-    print("Resume vector generated. Ready to score jobs.")
+    print("Resume ready. Ready to score jobs.")
 
 
     # 2. Connect to MongoDB and Load Jobs Data
@@ -183,96 +420,183 @@ def score_jobs_against_resume(resume_file="DougOsborne_Resume.pdf", checkpoint_i
     job_collection = db[COLLECTION_NAME]
     
     print(f"\n--- Loading job data from MongoDB collection: {COLLECTION_NAME} ---")
+    # Only the fields used for scoring; the large descriptions are dropped as soon as
+    # their embedding text has been built
+    projection = {
+        '_id': 0, 'title': 1, 'skills': 1, 'description': 1, 'url': 1, SCORED_RESUME_FIELD: 1,
+        SEMANTIC_SCORE_FIELD: 1, SKILLS_SCORE_FIELD: 1, MATCHED_SKILLS_COUNT_FIELD: 1
+    }
+    # Only fetch jobs that still need scoring, using the same rules as get_job_scoring_status
+    # ($not/$gt also matches missing or null scores), so scored jobs never leave MongoDB.
+    # Jobs without a semantic score for the current resume (never scored, or scored against an
+    # older resume) are the only ones that can reuse a stored vector, so only their query
+    # projects it; jobs that just need skills scores are fetched without it.
+    semantic_query = {'$or': [
+        {SEMANTIC_SCORE_FIELD: {'$not': {'$gt': 0}}},
+        {SCORED_RESUME_FIELD: {'$ne': resume_key}}
+    ]}
+    semantic_projection = {**projection, EMBEDDING_FIELD: 1, EMBEDDING_MODEL_FIELD: 1}
+    skills_only_query = {
+        SEMANTIC_SCORE_FIELD: {'$gt': 0},
+        SCORED_RESUME_FIELD: resume_key,
+        '$or': [
+            {SKILLS_SCORE_FIELD: {'$not': {'$gt': 0}}},
+            {MATCHED_SKILLS_COUNT_FIELD: {'$exists': False}}
+        ]
+    }
+    embedding_tag = get_embedding_tag(model_variant)
+    stale_embeddings = 0 # Stored vectors from a different model variant, re-encoded below
+    jobs_data = []
+    embed_indices = []
+    texts_to_embed = []
+    stored_indices = []
+    stored_vectors = []
     try:
-        # Fetch all documents as a list. We iterate over this list.
-        # We fetch all fields for scoring, but exclude the internal MongoDB '_id' for simplicity.
-        jobs_data = list(job_collection.find({}, {'_id': 0})) 
-        print(f"Loaded {len(jobs_data)} jobs.")
+        # Stream the cursors instead of materializing every full document with list()
+        jobs_cursor = itertools.chain(
+            job_collection.find(semantic_query, semantic_projection, batch_size=JOB_FETCH_BATCH_SIZE),
+            job_collection.find(skills_only_query, projection, batch_size=JOB_FETCH_BATCH_SIZE)
+        )
+        for i, job in enumerate(jobs_cursor):
+            # For every job that still needs a semantic score, reuse its stored embedding
+            # (job vectors don't depend on the resume) or collect its text for encoding
+            needs_scoring, semantic_score_exists = get_job_scoring_status(job, resume_key)
+            stored_embedding = job.pop(EMBEDDING_FIELD, None)
+            stored_embedding_tag = job.pop(EMBEDDING_MODEL_FIELD, None)
+            if stored_embedding is not None and stored_embedding_tag != embedding_tag:
+                # Produced by another model variant (or untagged): re-encode rather than mix vectors
+                stale_embeddings += 1
+                stored_embedding = None
+            if needs_scoring and not semantic_score_exists:
+                if stored_embedding is not None:
+                    stored_indices.append(i)
+                    stored_vectors.append(decode_embedding(stored_embedding))
+                else:
+                    job_embedding_input = get_job_embedding_input(job)
+                    if job_embedding_input.strip():
+                        embed_indices.append(i)
+                        texts_to_embed.append(job_embedding_input)
+            job.pop('description', None)
+            jobs_data.append(job)
+        print(f"Loaded {len(jobs_data)} jobs that need scoring.")
+        if stale_embeddings:
+            print(f"Re-encoding {stale_embeddings} stored job vectors that were not produced by '{embedding_tag}'.")
     except Exception as e:
         print(f"FATAL ERROR: An unexpected error occurred while loading job data from MongoDB: {e}")
         return
 
     if not jobs_data:
-        print("No job data found to process. Exiting.")
+        print("No unscored jobs found to process. Exiting.")
+        return
+
+    # Match every job skill against the resume in a single scan
+    skill_norm = build_skill_norm_map(jobs_data)
+    resume_skills = find_skills_in_resume(resume_text, skill_norm)
+    skills_scores, match_counts = calculate_skills_intersection_scores(resume_skills, jobs_data, skill_norm)
+
+    # 3. Embed every job that still needs a semantic score in one batched pass
+    print("\n--- Generating Job Vectors (Batched) ---")
+    try:
+        resume_vector_cached = resume_vector is not None
+        semantic_scores, resume_vector, job_matrix = calculate_semantic_similarities(
+            resume_text, resume_vector, texts_to_embed, embedder, embedding_batch_size
+        )
+        new_semantic_scores = dict(zip(embed_indices, semantic_scores))
+        # New job vectors are saved with the scores so later runs can skip encoding them
+        new_embeddings = {i: encode_embedding(vector) for i, vector in zip(embed_indices, job_matrix)}
+        print(f"Generated {len(new_semantic_scores)} job vectors.")
+
+        # Jobs with a stored embedding only need one matrix-vector product against the resume
+        if stored_vectors:
+            stored_scores = np.vstack(stored_vectors) @ resume_vector.astype(np.float32, copy=False)
+            new_semantic_scores.update(zip(stored_indices, (float(score) for score in stored_scores)))
+            print(f"Reused {len(stored_vectors)} stored job vectors.")
+        if not resume_vector_cached:
+            save_cached_resume(resume_cache_file, resume_text, resume_vector)
+    except Exception as e:
+        print(f"FATAL ERROR: Could not generate job vectors: {e}")
         return
 
-    # 3. Process Jobs
+    # 4. Process Jobs
     print("\n--- Starting Job Matching and Scoring ---")
     jobs_calculated_in_this_run = 0 # Tracks total jobs scored in the current session
     total_semantic_score = 0.0 # Running sum for semantic score average
     total_skills_score = 0.0 # Running sum for skills score average
+    # Score updates are handed to a writer thread that saves them in bulk_write batches
+    update_queue = queue.Queue(maxsize=SCORE_QUEUE_MAX_SIZE)
+    writer = threading.Thread(target=_score_writer, args=(job_collection, update_queue), daemon=True)
+    writer.start()
 
-    for i, job in enumerate(jobs_data):
-        job_index = i + 1
-        
-        # Get existing scores (for display/recalculation check)
-        semantic_score = job.get(SEMANTIC_SCORE_FIELD, 0.0)
-        skills_score = job.get(SKILLS_SCORE_FIELD, 0.0)
+    # The writer thread is always stopped, even if the loop fails, so its last batch is saved
+    try:
+        for i, job in enumerate(jobs_data):
+            job_index = i + 1
         
-        # Check if scoring is needed (i.e., if new scores are missing or 0.0)
-        # We also check for the existence of the score fields to handle cases where they might be explicitly 0.
-        semantic_score_exists = SEMANTIC_SCORE_FIELD in job and semantic_score > 0.0
-        skills_score_exists = SKILLS_SCORE_FIELD in job and skills_score > 0.0
-        raw_count_exists = MATCHED_SKILLS_COUNT_FIELD in job
+            # Get existing scores (for display/recalculation check)
+            semantic_score = job.get(SEMANTIC_SCORE_FIELD, 0.0)
+            skills_score = job.get(SKILLS_SCORE_FIELD, 0.0)
         
-        needs_scoring = not (semantic_score_exists and skills_score_exists and raw_count_exists)
+            needs_scoring, semantic_score_exists = get_job_scoring_status(job, resume_key)
         
-        job_title = job.get('title', 'Untitled')
+            job_title = job.get('title', 'Untitled')
 
 
-        if needs_scoring:
-            # --- CALCULATE SCORES ---
-            job_skills = job.get('skills', [])
-            job_embedding_input = get_job_embedding_input(job)
-            match_count = 0 
-
-            try:
-                # 3a. Calculate Semantic Score
-                if job_embedding_input.strip() and not semantic_score_exists:
-                    semantic_score = calculate_semantic_similarity(resume_vector, job_embedding_input, embedder)
-                #else:
-                   # semantic_score = 0.0
+            if needs_scoring:
+                # --- CALCULATE SCORES ---
+                try:
+                    # 4a. Use the Semantic Score from the batched pass
+                    if i in new_semantic_scores:
+                        semantic_score = new_semantic_scores[i]
+                    #else:
+                       # semantic_score = 0.0
                 
-                # 3b. Calculate Skills Intersection Score
-                skills_score, match_count = calculate_skills_intersection_score(resume_text, job_skills)
-
-                # Store the new fields in the job dictionary
-                job[SEMANTIC_SCORE_FIELD] = round(semantic_score, 4)
-                job[SKILLS_SCORE_FIELD] = round(skills_score, 4)
-                job[MATCHED_SKILLS_COUNT_FIELD] = match_count
+                    # 4b. Use the Skills Intersection Score from the vectorized pass
+                    skills_score = float(skills_scores[i])
+                    match_count = int(match_counts[i])
+
+                    # Store the new fields in the job dictionary
+                    job[SEMANTIC_SCORE_FIELD] = round(semantic_score, 4)
+                    job[SKILLS_SCORE_FIELD] = round(skills_score, 4)
+                    job[MATCHED_SKILLS_COUNT_FIELD] = match_count
                 
-                # Immediately update the document in MongoDB
-                _update_job_scores_in_mongo(job_collection, job)
-
-                # Update running totals 
-                total_semantic_score += semantic_score
-                total_skills_score += skills_score
-                jobs_calculated_in_this_run += 1
+                    # Queue the update; the writer thread sends it to MongoDB with the rest of its batch
+                    update = _build_score_update(job, resume_key, new_embeddings.get(i), embedding_tag)
+                    if update:
+                        update_queue.put(update)
+
+                    # Update running totals 
+                    total_semantic_score += semantic_score
+                    total_skills_score += skills_score
+                    jobs_calculated_in_this_run += 1
                 
-            except Exception as e:
-                # Log error but continue
-                print(f"Job {job_index} ({job_title}): Error during scoring: {e}. Skipping update for this job.")
+                except Exception as e:
+                    # Log error but continue
+                    print(f"Job {job_index} ({job_title}): Error during scoring: {e}. Skipping update for this job.")
 
         
-        # --- Logging Output (Controlled by CHECKPOINT_INTERVAL) ---
-        if job_index % checkpoint_interval == 0 or job_index == len(jobs_data):
-            current_avg_semantic = total_semantic_score / jobs_calculated_in_this_run if jobs_calculated_in_this_run > 0 else 0.0
-            current_avg_skills = total_skills_score / jobs_calculated_in_this_run if jobs_calculated_in_this_run > 0 else 0.0
-            
-            # Note: We display the semantic score field for consistency, even if it's the old 'resume_score' equivalent
-            # For simplicity, we can use the job dict accessors
-            print(
-                f"Job {job_index:<4}/{len(jobs_data)} "
-                f"| Title: {job_title:<50.50} "
-                f"| Semantic: {job.get(SEMANTIC_SCORE_FIELD):.4f} "
-                f"| Skills: {job.get(SKILLS_SCORE_FIELD):.4f} "
-                f"| Matched Count: {job.get(MATCHED_SKILLS_COUNT_FIELD, 0):<3} "
-                f"| Avg Sem: {current_avg_semantic:.4f} "
-                f"| Avg Skill: {current_avg_skills:.4f} "
-                f"| Status: {'SCORED' if needs_scoring else 'SKIPPED'}"
-            )
-        # --- End Logging Output ---
+            # --- Logging Output (Controlled by CHECKPOINT_INTERVAL) ---
+            if job_index % checkpoint_interval == 0 or job_index == len(jobs_data):
+                current_avg_semantic = total_semantic_score / jobs_calculated_in_this_run if jobs_calculated_in_this_run > 0 else 0.0
+                current_avg_skills = total_skills_score / jobs_calculated_in_this_run if jobs_calculated_in_this_run > 0 else 0.0
             
+                # Note: We display the semantic score field for consistency, even if it's the old 'resume_score' equivalent
+                # For simplicity, we can use the job dict accessors
+                print(
+                    f"Job {job_index:<4}/{len(jobs_data)} "
+                    f"| Title: {job_title:<50.50} "
+                    f"| Semantic: {job.get(SEMANTIC_SCORE_FIELD) or 0.0:.4f} "
+                    f"| Skills: {job.get(SKILLS_SCORE_FIELD) or 0.0:.4f} "
+                    f"| Matched Count: {job.get(MATCHED_SKILLS_COUNT_FIELD, 0):<3} "
+                    f"| Avg Sem: {current_avg_semantic:.4f} "
+                    f"| Avg Skill: {current_avg_skills:.4f} "
+                    f"| Status: {'SCORED' if needs_scoring else 'SKIPPED'}"
+                )
+            # --- End Logging Output ---
+    finally:
+        # Signal the writer thread that all updates are queued and wait for the last batch to be saved
+        update_queue.put(None)
+        writer.join()
+
     # 5. Final Summary
     print(f"\n--- Summary ---")
     print(f"Total jobs loaded: {len(jobs_data)}")
@@ -1,11 +1,20 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne, ASCENDING, WriteConcern, errors
+from bson.binary import UuidRepresentation
+from bson.codec_options import CodecOptions, DatetimeConversion
+from bson.datetime_ms import DatetimeMS
 import logging
 import os
-from datetime import datetime
+import argparse
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from datetime import datetime, timezone
 # Import the connection function from the new utility file
-from mongodb_functions import connect_to_mongodb
+from mongodb_functions import connect_to_mongodb, supports_transactions
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,135 +25,387 @@ SERVICE_ACCOUNT_PATH = r'F:\AIJobFinder\aijobfinder-9dd90-firebase-adminsdk-fbsv
 APP_ID = 'local-skill-rater-id'
 ROOT_COLLECTION = 'artifacts'
 
-# Target Path Structure: /artifacts/{APP_ID}/public/data/skill_ratings/{PROFILE_DOCUMENT_ID}
+# Target Path Structure: /artifacts/{APP_ID}/public/data/skill_ratings/{profile document}
+# Every profile document in the collection (e.g., 'Doug', 'Jane', etc.) is synced; its id becomes the profile_name.
 PUBLIC_COLLECTION = "public"
 DATA_COLLECTION = "data"
 RATINGS_COLLECTION = "skill_ratings"
 
-# The unique name of the profile document (e.g., 'Doug', 'Jane', etc.)
-PROFILE_DOCUMENT_ID = "Doug" 
-
-# FIX #1: The field name inside the 'Doug' document that holds the MAP (dictionary) of rated skills.
+# FIX #1: The field name inside each profile document that holds the MAP (dictionary) of rated skills.
 FIRESTORE_SKILL_MAP_FIELD = "ratings"
 
 
 # 2. MONGODB DESTINATION CONFIG (The connection URI and DB name are now in mongodb_functions.py)
 MONGO_COLLECTION_NAME = "skills_proficiency"
+BULK_WRITE_BATCH_SIZE = 1000 # Upserts sent per bulk_write call
+# Codec pinned to this schema (plain dicts, strings, ints, dates): no UUID/tz-aware decoding, and dates
+# are read back as DatetimeMS to match the raw-millisecond last_synced values written by the sync
+MONGO_CODEC_OPTIONS = CodecOptions(
+    document_class=dict,
+    tz_aware=False,
+    uuid_representation=UuidRepresentation.UNSPECIFIED,
+    datetime_conversion=DatetimeConversion.DATETIME_MS
+)
+
+# 3. LOCAL SYNC CACHE (Firestore update_time of the last successfully synced version of each profile)
+CACHE_DIR = ".cache"
+SYNC_CACHE_FILE = os.path.join(CACHE_DIR, "sync_ratings.json")
+
+# 4. WATCH MODE (--watch: keep running and sync profiles as they change in Firestore, via on_snapshot)
+WATCH_FLUSH_INTERVAL = 0.5 # Seconds between syncs of the buffered profile changes
 # -----------------------------------------------
 
+@lru_cache(maxsize=1)
+def _get_firestore_client():
+    """
+    Initializes the Firebase Admin SDK and returns one shared Firestore client, so repeated
+    syncs in a long-running process reuse the same client and gRPC channel.
+    Raises on failure; failures are not cached, so the next call tries again.
+    """
+    # Check if app is already initialized (important when running the script multiple times)
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
+        firebase_admin.initialize_app(cred)
+
+    logging.info("Firebase Admin SDK initialized successfully.")
+    return firestore.client()
+
 def initialize_firestore():
-    """Initializes the Firebase Admin SDK and returns the Firestore client."""
+    """Returns the shared Firestore client, initializing the Firebase Admin SDK on first use (None on failure)."""
     try:
         if not os.path.exists(SERVICE_ACCOUNT_PATH):
             logging.error(f"FATAL ERROR: Firebase Service Account JSON not found at: {SERVICE_ACCOUNT_PATH}")
             return None
 
-        # Check if app is already initialized (important when running the script multiple times)
-        if not firebase_admin._apps:
-            cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
-            firebase_admin.initialize_app(cred)
-        
-        logging.info("Firebase Admin SDK initialized successfully.")
-        return firestore.client()
+        return _get_firestore_client()
     except Exception as e:
         logging.error(f"Error initializing Firebase: {e}")
         return None
 
-def sync_skill_ratings():
-    """Fetches skill ratings from a single Firestore document and syncs them to MongoDB."""
-    db_firestore = initialize_firestore()
-    
-    # FIX #2: Use the imported function. This returns the client and the database object (db_mongo).
-    client_mongo, db_mongo = connect_to_mongodb()
+def load_sync_cache():
+    """Returns the {profile_id: update_time_iso} map from the sync cache file, or {} if it's missing or unreadable."""
+    if os.path.exists(SYNC_CACHE_FILE):
+        try:
+            with open(SYNC_CACHE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.warning(f"Could not read sync cache '{SYNC_CACHE_FILE}', doing a full sync: {e}")
+    return {}
+
+def save_sync_cache(sync_cache):
+    """Writes the {profile_id: update_time_iso} map so the next run can skip an unchanged profile."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(SYNC_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(sync_cache, f, indent=2)
+    except Exception as e:
+        logging.warning(f"Could not write sync cache '{SYNC_CACHE_FILE}': {e}")
+
+def bulk_write_ratings(collection, operations, operation_profiles, session=None):
+    """
+    Sends the rating upserts in unordered bulk_write batches of BULK_WRITE_BATCH_SIZE operations.
+    Outside a transaction a failed write doesn't stop the rest: it's logged and its profile (from
+    operation_profiles, parallel to operations) is recorded. Inside a transaction the error is
+    re-raised instead, since the server has already aborted the transaction.
+
+    Returns:
+        tuple: (upserted, matched, modified, failed, failed_profiles)
+    """
+    upserted = matched = modified = failed = 0
+    failed_profiles = set()
+    for start in range(0, len(operations), BULK_WRITE_BATCH_SIZE):
+        try:
+            result = collection.bulk_write(operations[start:start + BULK_WRITE_BATCH_SIZE], ordered=False, session=session)
+            upserted += result.upserted_count
+            matched += result.matched_count
+            modified += result.modified_count
+        except errors.BulkWriteError as bwe:
+            if session is not None and session.in_transaction:
+                raise
+            # With ordered=False the rest of the batch is still applied; count what succeeded and keep going
+            write_errors = bwe.details.get('writeErrors', [])
+            upserted += bwe.details.get('nUpserted', 0)
+            matched += bwe.details.get('nMatched', 0)
+            modified += bwe.details.get('nModified', 0)
+            failed += len(write_errors)
+            # Each error's 'index' is relative to its batch
+            failed_profiles.update(operation_profiles[start + error['index']] for error in write_errors)
+            logging.warning(f"Bulk write batch completed with errors: {write_errors}")
+    return upserted, matched, modified, failed, failed_profiles
+
+def connect_databases():
+    """
+    Initializes Firestore and connects to MongoDB (concurrently), then prepares the ratings collection.
+
+    Returns:
+        tuple: (Firestore client, MongoClient, skills_proficiency Collection), or (None, None, None) on failure.
+    """
+    # Firebase init and the MongoDB connect/ping are independent network calls, so run them concurrently
+    phase_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        firestore_future = executor.submit(initialize_firestore)
+        # FIX #2: Use the imported function. This returns the client and the database object (db_mongo).
+        mongo_future = executor.submit(connect_to_mongodb)
+        db_firestore = firestore_future.result()
+        client_mongo, db_mongo = mongo_future.result()
+    # Phase timings are logged as "phase=<name> ms=<elapsed>" so log aggregators can parse them
+    logging.info(f"phase=connect ms={(time.perf_counter() - phase_start) * 1000:.1f}")
 
     # Check for initialization/connection failure
     # We check client_mongo specifically because the Pymongo Collection object doesn't support bool()
     if db_firestore is None or client_mongo is None:
         logging.error("Database initialization or connection failed. Aborting sync.")
-        return
+        return None, None, None
 
-    # Get the target collection using the returned database object
-    collection_mongo = db_mongo[MONGO_COLLECTION_NAME]
+    # Get the target collection using the returned database object.
+    # Firestore is the source of truth and the upserts are idempotent (a lost write is fixed by re-running),
+    # so acknowledge writes without waiting for the journal flush.
+    collection_mongo = db_mongo.get_collection(
+        MONGO_COLLECTION_NAME,
+        codec_options=MONGO_CODEC_OPTIONS,
+        write_concern=WriteConcern(w=1, j=False)
+    )
     logging.info(f"Targeting MongoDB collection: '{MONGO_COLLECTION_NAME}'")
 
+    # Unique compound index on the upsert filter, so each upsert is an index seek instead of a
+    # collection scan. create_index is a no-op when the index already exists, so it's safe every run.
+    try:
+        collection_mongo.create_index(
+            [("profile_name", ASCENDING), ("skill_name", ASCENDING)],
+            unique=True,
+            name="profile_skill_uniq"
+        )
+    except errors.OperationFailure as e:
+        # e.g. duplicate (profile_name, skill_name) pairs already stored; the sync still works without it
+        logging.warning(f"Could not create the profile/skill index on '{MONGO_COLLECTION_NAME}': {e}")
+
+    return db_firestore, client_mongo, collection_mongo
 
-    # Build the document reference for the specific profile
-    doc_ref = (
+def get_ratings_collection(db_firestore):
+    """Returns the reference to the Firestore ratings collection (one document per profile)."""
+    return (
         db_firestore.collection(ROOT_COLLECTION)
         .document(APP_ID)
         .collection(PUBLIC_COLLECTION)
         .document(DATA_COLLECTION)
         .collection(RATINGS_COLLECTION)
-        .document(PROFILE_DOCUMENT_ID)
     )
 
-    ratings_path = f"/{ROOT_COLLECTION}/{APP_ID}/{PUBLIC_COLLECTION}/{DATA_COLLECTION}/{RATINGS_COLLECTION}/{PROFILE_DOCUMENT_ID}"
-    logging.info(f"Attempting to fetch ratings from Firestore document: {ratings_path}")
+def sync_profile_snapshots(client_mongo, collection_mongo, snapshots, sync_cache):
+    """
+    Syncs the ratings map of each Firestore profile snapshot to MongoDB: unchanged skills are skipped,
+    the rest are upserted in bulk, and each fully written profile's update_time is saved to sync_cache.
+    Used by both the one-shot sync (batched get_all) and watch mode (on_snapshot changes).
+    """
+    profiles = {} # profile name -> (update_time, rated skills map)
+    # Profiles that can't be synced are collected and reported once after the loop, not warned per document
+    deleted_profiles = []
+    empty_profiles = []
+    for doc in snapshots:
+        if not doc.exists:
+            deleted_profiles.append(doc.id)
+            continue
 
-    try:
-        doc = doc_ref.get()
+        # Use the corrected field name: "ratings"
+        rated_skills_map = (doc.to_dict() or {}).get(FIRESTORE_SKILL_MAP_FIELD, {})
+        if not rated_skills_map:
+            empty_profiles.append(doc.id)
+            continue
 
-        if not doc.exists:
-            logging.error(f"Firestore document not found at path: {ratings_path}")
-            return
+        profiles[doc.id] = (doc.update_time, rated_skills_map)
+    if deleted_profiles:
+        logging.warning(f"{len(deleted_profiles)} profile document(s) were deleted before they could be read: {', '.join(deleted_profiles)}.")
+    if empty_profiles:
+        logging.warning(f"No skill ratings found in the field '{FIRESTORE_SKILL_MAP_FIELD}' within {len(empty_profiles)} profile document(s): {', '.join(empty_profiles)}.")
 
-        data = doc.to_dict()
-        if data is None:
-             logging.error(f"Data retrieved from Firestore document is None. Path: {ratings_path}")
-             return
+    if not profiles:
+        return
 
-        # Use the corrected field name: "ratings"
-        rated_skills_map = data.get(FIRESTORE_SKILL_MAP_FIELD, {})
+    # Load the ratings already stored for these profiles (one query), so unchanged skills aren't rewritten
+    phase_start = time.perf_counter()
+    existing_ratings = {
+        (d["profile_name"], d["skill_name"]): d.get("user_rating")
+        for d in collection_mongo.find(
+            {"profile_name": {"$in": list(profiles)}},
+            {"profile_name": 1, "skill_name": 1, "user_rating": 1, "_id": 0}
+        )
+    }
+    logging.info(f"phase=mongo_read ms={(time.perf_counter() - phase_start) * 1000:.1f}")
 
-        if not rated_skills_map:
-            logging.warning(f"No skill ratings found in the field '{FIRESTORE_SKILL_MAP_FIELD}' within document '{PROFILE_DOCUMENT_ID}'.")
-            return
+    # One timezone-aware timestamp for the whole sync, instead of calling utcnow() per skill.
+    # Stored as DatetimeMS (UTC milliseconds), which BSON encodes directly without datetime conversion.
+    sync_time = DatetimeMS(datetime.now(timezone.utc))
 
-        count = 0
-        # Iterate over the map's items() to get key (skill_name) and value (rating) directly
-        for skill_name, rating in rated_skills_map.items():
+    count = unchanged = skipped = 0
+    operations = []
+    operation_profiles = [] # Profile of each operation, so write errors can be traced back to their profile
+    for profile_name, (update_time, rated_skills_map) in profiles.items():
+        # Validate once up front: keep only entries that have both a skill name and a rating
+        valid_items = [
+            (skill_name, rating) for skill_name, rating in rated_skills_map.items()
+            if skill_name and rating is not None
+        ]
+        skipped += len(rated_skills_map) - len(valid_items)
+        count += len(valid_items)
 
-            if skill_name and rating is not None:
-                # 1. Define the unique identifier using both skill name and profile name (composite key)
-                filter_query = {
-                    "skill_name": skill_name,
-                    "profile_name": PROFILE_DOCUMENT_ID 
-                }
+        # Only write skills whose stored rating differs or is missing (last_synced only moves on real changes)
+        changed_items = [
+            (skill_name, rating) for skill_name, rating in valid_items
+            if existing_ratings.get((profile_name, skill_name)) != rating
+        ]
+        unchanged += len(valid_items) - len(changed_items)
 
-                # 2. Define the data to be set/updated
-                update_data = {
+        # 1-3. Upsert on the composite key (skill name + profile name): insert if not found, update if found
+        operations.extend(
+            UpdateOne(
+                {"skill_name": skill_name, "profile_name": profile_name},
+                {
                     "$set": {
                         "skill_name": skill_name,
-                        "profile_name": PROFILE_DOCUMENT_ID,
-                        "user_rating": rating, 
-                        "last_synced": datetime.utcnow() 
+                        "profile_name": profile_name,
+                        "user_rating": rating,
+                        "last_synced": sync_time
                     }
-                }
+                },
+                upsert=True
+            )
+            for skill_name, rating in changed_items
+        )
+        operation_profiles.extend([profile_name] * len(changed_items))
 
-                # 3. Upsert: Insert if not found, update if found
-                result = collection_mongo.update_one(
-                    filter_query,
-                    update_data,
-                    upsert=True
+    if skipped:
+        logging.warning(f"Skipped {skipped} malformed skill entries (missing skill name or rating).")
+
+    # 4. Send the upserts for every profile in unordered bulk_write batches instead of one round trip per skill
+    phase_start = time.perf_counter()
+    if operations and supports_transactions(client_mongo):
+        # Replica set / sharded cluster: write every batch in one transaction, so all profiles
+        # are committed together (and retried as a whole on transient errors) or not at all
+        with client_mongo.start_session() as session:
+            try:
+                upserted, matched, modified, failed, failed_profiles = session.with_transaction(
+                    lambda s: bulk_write_ratings(collection_mongo, operations, operation_profiles, session=s),
+                    write_concern=collection_mongo.write_concern
                 )
+            except errors.PyMongoError as e:
+                logging.warning(f"Ratings transaction aborted, no skill ratings were written: {e}")
+                upserted = matched = modified = 0
+                failed = len(operations)
+                failed_profiles = set(operation_profiles)
+    else:
+        # Standalone server (no transactions): failed writes are logged and the rest still applied
+        upserted, matched, modified, failed, failed_profiles = bulk_write_ratings(
+            collection_mongo, operations, operation_profiles
+        )
+    logging.info(f"phase=mongo_write ms={(time.perf_counter() - phase_start) * 1000:.1f}")
+
+    # One summary line for the whole sync, from the bulk write results (no per-skill logging in the loop)
+    logging.info(
+        f"Bulk write finished: {upserted} skill ratings inserted, {matched} matched, {modified} updated, "
+        f"{unchanged} unchanged (skipped), {failed} failed."
+    )
+
+    # Remember each profile's synced version only if all of its writes succeeded, so failed profiles are retried next run
+    for profile_name, (update_time, _) in profiles.items():
+        if profile_name not in failed_profiles:
+            sync_cache[profile_name] = update_time.isoformat()
+    save_sync_cache(sync_cache)
+
+    logging.info(f"Sync complete! Successfully processed and synced {count} skill ratings for {len(profiles)} profile(s): {', '.join(profiles)}.")
+
+def sync_skill_ratings():
+    """Fetches skill ratings from every Firestore profile document and syncs them to MongoDB."""
+    db_firestore, client_mongo, collection_mongo = connect_databases()
+    if client_mongo is None:
+        return
+
+    ratings_collection = get_ratings_collection(db_firestore)
+    ratings_path = f"/{ROOT_COLLECTION}/{APP_ID}/{PUBLIC_COLLECTION}/{DATA_COLLECTION}/{RATINGS_COLLECTION}"
+    logging.info(f"Attempting to fetch ratings from Firestore collection: {ratings_path}")
 
-                if result.upserted_id:
-                    logging.debug(f"Inserted new skill rating for: {skill_name} ({PROFILE_DOCUMENT_ID})")
-                elif result.modified_count > 0:
-                    logging.debug(f"Updated skill rating for: {skill_name} ({PROFILE_DOCUMENT_ID}) to {rating}")
+    try:
+        # Cheap freshness check: one query streams just the metadata (id + update_time) of every profile,
+        # and only profiles updated since their last successful sync are fetched and synced
+        sync_cache = load_sync_cache()
+        phase_start = time.perf_counter()
+        profile_metadata = list(ratings_collection.select([]).stream())
+        if not profile_metadata:
+            logging.error(f"No profile documents found in Firestore collection: {ratings_path}")
+            return
+
+        changed_refs = [
+            snapshot.reference for snapshot in profile_metadata
+            if sync_cache.get(snapshot.id) != snapshot.update_time.isoformat()
+        ]
+        if not changed_refs:
+            logging.info(f"All {len(profile_metadata)} profile(s) unchanged since the last sync. Nothing to do.")
+            return
 
-                count += 1
-            else:
-                logging.warning(f"Skipping malformed skill object. Missing skill or rating for entry: {skill_name} -> {rating}.")
+        # Fetch the changed profiles in one batched read. Field mask: only the ratings map is used,
+        # so don't download the rest of each profile document.
+        snapshots = list(db_firestore.get_all(changed_refs, field_paths=[FIRESTORE_SKILL_MAP_FIELD]))
+        logging.info(f"phase=firestore_read ms={(time.perf_counter() - phase_start) * 1000:.1f}")
 
-        logging.info(f"Sync complete! Successfully processed and synced {count} skill ratings for profile '{PROFILE_DOCUMENT_ID}'.")
+        sync_profile_snapshots(client_mongo, collection_mongo, snapshots, sync_cache)
 
     except Exception as e:
         logging.error(f"An unexpected error occurred during data synchronization: {e}")
+
+def watch_skill_ratings():
+    """
+    Keeps running and syncs profiles as they change in Firestore, instead of polling.
+    An on_snapshot listener on the ratings collection receives only added/modified profile
+    documents; they are buffered and synced every WATCH_FLUSH_INTERVAL seconds, so a burst of
+    rating clicks becomes one bulk write. The listener's first snapshot delivers every profile,
+    which catches up on changes made while the script wasn't running (unchanged ones are skipped
+    via the sync cache). Stop with Ctrl+C.
+    """
+    db_firestore, client_mongo, collection_mongo = connect_databases()
+    if client_mongo is None:
+        return
+
+    sync_cache = load_sync_cache()
+    pending = {} # profile name -> latest changed snapshot, filled by the listener thread
+    pending_lock = threading.Lock()
+
+    def on_ratings_change(collection_snapshot, changes, read_time):
+        with pending_lock:
+            for change in changes:
+                doc = change.document
+                # Removed profiles are ignored (the sync never deletes MongoDB ratings); unchanged ones are skipped
+                if change.type.name != 'REMOVED' and sync_cache.get(doc.id) != doc.update_time.isoformat():
+                    pending[doc.id] = doc
+
+    watch = get_ratings_collection(db_firestore).on_snapshot(on_ratings_change)
+    logging.info(f"Watching Firestore collection '{RATINGS_COLLECTION}' for rating changes. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(WATCH_FLUSH_INTERVAL)
+            with pending_lock:
+                snapshots = list(pending.values())
+                pending.clear()
+            if snapshots:
+                try:
+                    sync_profile_snapshots(client_mongo, collection_mongo, snapshots, sync_cache)
+                except Exception as e:
+                    # Keep watching; the profiles are retried on their next change or the next one-shot sync
+                    logging.error(f"An unexpected error occurred during data synchronization: {e}")
+    except KeyboardInterrupt:
+        logging.info("Stopping the Firestore watch.")
     finally:
-        if client_mongo:
-            client_mongo.close()
-            logging.info("MongoDB connection closed.")
+        watch.unsubscribe()
 
 if __name__ == "__main__":
-    sync_skill_ratings()
+    # One-shot sync by default; --watch keeps running and syncs profiles as they change
+    parser = argparse.ArgumentParser(description="Sync skill ratings from Firestore to MongoDB.")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and sync profiles as they change in Firestore (Ctrl+C to stop)"
+    )
+    args = parser.parse_args()
+
+    if args.watch:
+        watch_skill_ratings()
+    else:
+        sync_skill_ratings()